@@ -13,6 +13,112 @@ CHANNEL_USERNAMES = ["tibshifouz", "pulsecare"]  # 🔥 YANGILANDI - array forma
 
 # Ma'lumotlar bazasi
 DATABASE_NAME = "tibshifo_support.db"
+DB_BUSY_TIMEOUT = 10  # soniya - band bo'lsa kutish
+DB_CACHE_SIZE_KB = 16384  # har bir ulanish uchun sahifa keshi (16 MB)
+DB_MMAP_SIZE = 64 * 1024 * 1024  # memory-mapped I/O (64 MB)
+DB_STATEMENT_CACHE_SIZE = 256  # tayyorlangan so'rovlar keshi
+DB_READ_THREADS = 2  # o'qish so'rovlari uchun threadlar soni
+DB_MAX_PENDING_WRITES = 200  # navbatdagi yozish so'rovlari chegarasi
+DB_MAX_PENDING_READS = 200  # navbatdagi o'qish so'rovlari chegarasi
+DB_STREAM_CHUNK_SIZE = 500  # katta o'qishlarda bir fetchmany qismidagi qatorlar
+
+# Foydalanuvchi faolligi (last_active) buferi
+ACTIVITY_FLUSH_INTERVAL = 60  # soniya - buferni bazaga yozish oralig'i
+ACTIVITY_FLUSH_THRESHOLD = 500  # shuncha foydalanuvchi to'planganda darhol yoziladi
+
+# So'rovlar ro'yxatida bitta sahifadagi elementlar soni
+REQUESTS_PAGE_SIZE = 10
+
+# Holatlar soni (support panel) keshi muddati, soniya
+STATUS_COUNTS_CACHE_TTL = 5
+
+# Backup sozlamalari
+BACKUP_DIR = "backups"
+BACKUP_INTERVAL_HOURS = 6  # avtomatik backup oralig'i
+BACKUP_PAGES_PER_STEP = 256  # bitta qadamda nusxalanadigan sahifalar
+BACKUP_STEP_SLEEP = 0.05  # baza band bo'lsa qayta urinishdan oldingi pauza, soniya
+BACKUP_MAX_RESTARTS = 5  # shundan keyin bitta qadamda nusxalanadi
+BACKUP_KEEP_COUNT = 14  # saqlanadigan backuplar soni
+BACKUP_KEEP_DAYS = 7  # bundan eski backuplar o'chiriladi
+
+# CSV eksport fayllari (admin /export buyrug'i)
+EXPORT_DIR = "exports"
+
+# Eski ma'lumotlarni arxivlash va tozalash
+ARCHIVE_DIR = "archive"
+RETENTION_DAYS = 30  # bundan eski yakunlangan so'rovlar arxivga o'tkaziladi
+RETENTION_INTERVAL_HOURS = 24  # tozalash oralig'i
+RETENTION_BATCH_SIZE = 200  # bitta tranzaksiyadagi so'rovlar soni
+RETENTION_BATCH_PAUSE = 0.1  # qismlar orasidagi pauza, soniya
+RETENTION_VACUUM_PAGES = 500  # incremental_vacuum bir qadamda qaytaradigan sahifalar
+
+# Kanal obunasi tekshiruvi keshi
+SUBSCRIPTION_CACHE_SIZE = 10000  # keshdagi foydalanuvchilar soni (LRU)
+SUBSCRIPTION_CACHE_TTL = 600  # obuna bo'lganlar uchun, soniya
+SUBSCRIPTION_CACHE_NEGATIVE_TTL = 30  # obuna bo'lmaganlar uchun, soniya
+CHANNEL_CHECK_TIMEOUT = 5  # bitta kanal tekshiruvi uchun kutish chegarasi, soniya
+CHANNEL_MEMBERS_MAX_AGE = 24 * 3600  # a'zolar jadvalidagi yozuv shundan keyin API dan yangilanadi
+
+# Kanal API xatoliklarida circuit breaker
+CHANNEL_BREAKER_FAILURE_THRESHOLD = 3  # ketma-ket xatoliklar soni - shundan keyin to'xtatiladi
+CHANNEL_BREAKER_BASE_DELAY = 5  # birinchi to'xtatish muddati, soniya (har safar 2 barobar)
+CHANNEL_BREAKER_MAX_DELAY = 300  # eng uzoq to'xtatish muddati, soniya
+# API ishlamaganda: "last_known" - oxirgi ma'lum status, "allow" - ruxsat, "deny" - rad etish
+SUBSCRIPTION_DEGRADED_POLICY = "last_known"
+
+# Broadcast sozlamalari
+BROADCAST_RATE = 25  # xabar/soniya - Telegram umumiy limiti ~30
+BROADCAST_BURST = 25  # qisqa muddatli portlash hajmi (token bucket sig'imi)
+BROADCAST_CONCURRENCY = 10  # bir vaqtda yuborilayotgan xabarlar
+BROADCAST_BATCH_SIZE = 100  # bir qismdagi qabul qiluvchilar (natijalar shundan keyin yoziladi)
+BROADCAST_MAX_ATTEMPTS = 3  # RetryAfter/tarmoq xatoliklarida urinishlar soni
+BROADCAST_PROGRESS_INTERVAL = 5  # progress xabarini yangilash oralig'i, soniya
+DELIVERY_REPROBE_INTERVAL = 30 * 24 * 3600  # bloklaganlarga qayta urinib ko'rish oralig'i, soniya
+
+# Chiquvchi xabarlar navbati (Telegram limitlari)
+OUTBOUND_GLOBAL_RATE = 28  # xabar/soniya - bot bo'yicha umumiy (Telegram ~30)
+OUTBOUND_GLOBAL_BURST = 28
+OUTBOUND_CHAT_RATE = 1  # shaxsiy chatga xabar/soniya
+OUTBOUND_CHAT_BURST = 3
+OUTBOUND_GROUP_RATE = 20 / 60  # guruhga xabar/soniya (Telegram: 20 ta/daqiqa)
+OUTBOUND_GROUP_BURST = 3
+OUTBOUND_MAX_RETRIES = 3  # RetryAfter dan keyin qayta urinishlar
+OUTBOUND_MAX_TRACKED_CHATS = 5000  # shundan oshsa bo'sh turgan chat limitlari o'chiriladi
+
+# Guruhga yangi so'rov bildirishnomalari
+NOTIFY_SINGLE_PER_MINUTE = 6  # daqiqada shundan ko'p bo'lsa digest rejimiga o'tiladi
+NOTIFY_DIGEST_WINDOW = 10  # digest uchun yig'ish oynasi, soniya (eng ko'p kechikish)
+NOTIFY_DIGEST_MAX_ITEMS = 10  # bitta digestdagi so'rovlar
+NOTIFY_DIGEST_PREVIEW = 200  # digestda xabar matnining uzunligi
+NOTIFY_MAX_TEXT = 4000  # bitta xabar uzunligi, UTF-16 birliklarida (Telegram chegarasi 4096)
+NOTIFY_MAX_ATTEMPTS = 3  # yuborilmagan bildirishnoma navbatga qaytariladigan urinishlar soni
+NOTIFY_RETRY_DELAY = 5  # muvaffaqiyatsiz yuborishdan keyin kutish, soniya
+NOTIFY_MAX_PENDING = 200  # navbat chegarasi - ortig'i digestda "yana N ta" deb ko'rsatiladi
+
+# Flood nazorati (foydalanuvchi bo'yicha, asosiy admin cheklanmaydi)
+FLOOD_SUBMIT_RATE = 1 / 60  # so'rov yuborish: o'rtacha 1 ta/daqiqa
+FLOOD_SUBMIT_BURST = 3
+FLOOD_BROWSE_RATE = 1  # menyu, buyruqlar, tugmalar: o'rtacha 1 ta/soniya
+FLOOD_BROWSE_BURST = 8
+FLOOD_COOLDOWN_BASE = 10  # birinchi buzilishdagi cooldown, soniya (keyin ikki barobar)
+FLOOD_COOLDOWN_MAX = 600  # eng uzun cooldown, soniya
+FLOOD_STRIKE_RESET = 600  # shuncha vaqt tinch tursa buzilishlar hisobi tozalanadi
+FLOOD_MAX_TRACKED_USERS = 10000  # shundan oshsa bo'sh budjetlar o'chiriladi
+FLOOD_ADMIN_CACHE_TTL = 60  # guruh adminlari ro'yxati keshi, soniya
+
+# Takroriy so'rovlarni aniqlash (MinHash/LSH)
+DEDUP_SHINGLE_SIZE = 4  # belgi k-gramlari uzunligi
+DEDUP_BANDS = 16  # LSH bo'laklari
+DEDUP_ROWS = 4  # bo'lakdagi MinHash qiymatlari (imzo: BANDS * ROWS)
+DEDUP_USER_THRESHOLD = 0.7  # o'sha foydalanuvchining so'rovi bilan o'xshashlik - birlashtiriladi
+DEDUP_GLOBAL_THRESHOLD = 0.85  # boshqa foydalanuvchi so'rovi bilan - belgilanadi
+DEDUP_WINDOW = 7 * 24 * 3600  # shundan eski so'rovlar indeksda saqlanmaydi, soniya
+DEDUP_MAX_ENTRIES = 5000  # indeksdagi so'rovlar chegarasi
+
+# Yangilanishlarni parallel qayta ishlash (bitta foydalanuvchiniki - navbat bilan)
+UPDATE_WORKERS = 16  # bir vaqtda ishlayotgan handlerlar
+UPDATE_MAX_PENDING = 256  # qabul qilingan, hali tugamagan yangilanishlar chegarasi
+UPDATE_MAX_PER_USER = 5  # bitta foydalanuvchining navbatdagi yangilanishlari (ortig'i tashlanadi)
 
 # Keep alive sozlamalari
 KEEP_ALIVE_URL = os.getenv("RENDER_EXTERNAL_URL", "")
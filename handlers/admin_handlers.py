@@ -1,14 +1,25 @@
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters
+from telegram import (
+    Update, ReplyKeyboardMarkup, ReplyKeyboardRemove,
+    InlineKeyboardMarkup, InlineKeyboardButton
+)
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 import config
 import logging
-from utils.database import (
-    get_requests_by_status, update_request_status, 
-    add_reply, get_request_details, get_all_users, search_user,
+import os
+from utils.async_db import (
+    get_status_counts, get_requests_page,
+    add_reply, get_request_details, search_user, search_requests,
     is_group_member_admin, add_group_admin, get_group_admins,
-    get_statistics, get_all_requests
+    get_statistics, backup_database, find_archived_request,
+    create_broadcast_job, get_broadcast_job, set_broadcast_progress_message,
+    set_broadcast_job_status, get_recent_broadcast_jobs, export_requests, export_users
 )
-import asyncio
+from utils.time_utils import format_timestamp
+from utils.channel_check import get_subscription_cache_stats
+from utils.delivery import record_delivery_failure
+from utils.flood_control import invalidate_admin_cache
+from utils.broadcast import start_broadcast, is_broadcast_running, format_progress
 
 logger = logging.getLogger(__name__)
 
@@ -47,19 +58,73 @@ async def handle_support_panel(update: Update, context: ContextTypes.DEFAULT_TYP
     if user.id != config.ADMIN_ID:
         return
     
-    # So'rovlarni holati bo'yicha olish
-    pending = get_requests_by_status('pending')
-    in_progress = get_requests_by_status('in_progress')
-    completed = get_requests_by_status('completed')
+    # So'rovlar soni holati bo'yicha
+    counts = await get_status_counts()
     
     text = "📋 Support Panel\n\n"
-    text += f"⏳ Kutayotgan: {len(pending)} ta\n"
-    text += f"🔄 Jarayonda: {len(in_progress)} ta\n"
-    text += f"✅ Yakunlangan: {len(completed)} ta\n\n"
+    text += f"⏳ Kutayotgan: {counts['pending']} ta\n"
+    text += f"🔄 Jarayonda: {counts['in_progress']} ta\n"
+    text += f"✅ Yakunlangan: {counts['completed']} ta\n\n"
     text += "Pastdagi tugmalardan foydalaning:"
     
     await update.message.reply_text(text, reply_markup=SUPPORT_KEYBOARD)
 
+# So'rovlar ro'yxati ko'rinishlari: sarlavha, bo'sh bo'lsa matn
+REQUEST_LIST_VIEWS = {
+    'pending': ("⏳ KUTAYOTGAN SO'ROVLAR", "⏳ Kutayotgan so'rovlar yo'q."),
+    'in_progress': ("🔄 JARAYONDAGI SO'ROVLAR", "🔄 Jarayondagi so'rovlar yo'q."),
+    'completed': ("✅ YAKUNLANGAN SO'ROVLAR", "✅ Yakunlangan so'rovlar yo'q."),
+    'all': ("📋 BARCHA SO'ROVLAR", "📭 Hozircha so'rovlar yo'q."),
+}
+
+STATUS_EMOJI = {
+    'pending': '⏳',
+    'in_progress': '🔄',
+    'completed': '✅'
+}
+
+async def build_requests_page(view, cursor=None, direction='next'):
+    """So'rovlar sahifasi matni va navigatsiya tugmalarini tayyorlash"""
+    status = None if view == 'all' else view
+    rows, has_prev, has_next = await get_requests_page(
+        status, cursor, direction, limit=config.REQUESTS_PAGE_SIZE
+    )
+    title, empty_text = REQUEST_LIST_VIEWS[view]
+    
+    if not rows and cursor is not None:
+        # Sahifa bo'shab qolgan (so'rovlar holati o'zgargan) - birinchi sahifa ko'rsatiladi
+        return await build_requests_page(view)
+    if not rows:
+        return empty_text, None
+    
+    text = f"{title}:\n\n"
+    for req in rows:
+        if view == 'all':
+            text += f"{STATUS_EMOJI.get(req.status, '❓')} #{req.id}\n"
+        else:
+            text += f"🔸 #{req.id}\n"
+        text += f"👤: @{req.username or req.first_name or req.user_id}\n"
+        text += f"📝: {req.message[:80]}...\n"
+        text += f"📅: {format_timestamp(req.created_at)}\n"
+        if req.status != 'completed':
+            text += f"✏️ Javob: /reply {req.id} [xabar]\n"
+        text += "─" * 30 + "\n"
+    
+    # Callback: rq|<ko'rinish>|<yo'nalish: prev, next, first>|<created_at>|<id>
+    buttons = []
+    if has_prev:
+        first = rows[0]
+        buttons.append(InlineKeyboardButton(
+            "⬅️ Oldingi", callback_data=f"rq|{view}|prev|{first.created_at}|{first.id}"
+        ))
+    if has_next:
+        last = rows[-1]
+        buttons.append(InlineKeyboardButton(
+            "Keyingi ➡️", callback_data=f"rq|{view}|next|{last.created_at}|{last.id}"
+        ))
+    
+    return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
 async def handle_pending_requests(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Kutayotgan so'rovlarni ko'rsatish"""
     user = update.effective_user
@@ -67,21 +132,8 @@ async def handle_pending_requests(update: Update, context: ContextTypes.DEFAULT_
     if user.id != config.ADMIN_ID:
         return
     
-    pending = get_requests_by_status('pending')
-    
-    if not pending:
-        text = "⏳ Kutayotgan so'rovlar yo'q."
-    else:
-        text = "⏳ KUTAYOTGAN SO'ROVLAR:\n\n"
-        for req in pending[:10]:  # Faqat 10 tasini ko'rsatish
-            text += f"🔸 #{req[0]}\n"
-            text += f"👤: @{req[7] or req[8] or req[1]}\n"
-            text += f"📝: {req[2][:80]}...\n"
-            text += f"📅: {req[5]}\n"
-            text += f"✏️ Javob: /reply {req[0]} [xabar]\n"
-            text += "─" * 30 + "\n"
-    
-    await update.message.reply_text(text, reply_markup=SUPPORT_KEYBOARD)
+    text, keyboard = await build_requests_page('pending')
+    await update.message.reply_text(text, reply_markup=keyboard or SUPPORT_KEYBOARD)
 
 async def handle_in_progress_requests(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Jarayondagi so'rovlarni ko'rsatish"""
@@ -90,21 +142,8 @@ async def handle_in_progress_requests(update: Update, context: ContextTypes.DEFA
     if user.id != config.ADMIN_ID:
         return
     
-    in_progress = get_requests_by_status('in_progress')
-    
-    if not in_progress:
-        text = "🔄 Jarayondagi so'rovlar yo'q."
-    else:
-        text = "🔄 JARAYONDAGI SO'ROVLAR:\n\n"
-        for req in in_progress[:10]:
-            text += f"🔸 #{req[0]}\n"
-            text += f"👤: @{req[7] or req[8] or req[1]}\n"
-            text += f"📝: {req[2][:80]}...\n"
-            text += f"📅: {req[5]}\n"
-            text += f"✏️ Javob: /reply {req[0]} [xabar]\n"
-            text += "─" * 30 + "\n"
-    
-    await update.message.reply_text(text, reply_markup=SUPPORT_KEYBOARD)
+    text, keyboard = await build_requests_page('in_progress')
+    await update.message.reply_text(text, reply_markup=keyboard or SUPPORT_KEYBOARD)
 
 async def handle_completed_requests(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Yakunlangan so'rovlarni ko'rsatish"""
@@ -113,20 +152,43 @@ async def handle_completed_requests(update: Update, context: ContextTypes.DEFAUL
     if user.id != config.ADMIN_ID:
         return
     
-    completed = get_requests_by_status('completed')
+    text, keyboard = await build_requests_page('completed')
+    await update.message.reply_text(text, reply_markup=keyboard or SUPPORT_KEYBOARD)
+
+async def requests_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """So'rovlar ro'yxatida oldingi/keyingi sahifaga o'tish"""
+    query = update.callback_query
     
-    if not completed:
-        text = "✅ Yakunlangan so'rovlar yo'q."
+    try:
+        _, view, direction, created_at, request_id = query.data.split("|", 4)
+        cursor = None if direction == 'first' else (int(created_at), int(request_id))
+    except ValueError:
+        await query.answer("❌ Noto'g'ri so'rov")
+        return
+    
+    # Barcha so'rovlar - guruhda, holat bo'yicha ro'yxatlar - faqat admin uchun
+    if view == 'all':
+        allowed = query.message.chat.id == config.GROUP_ID
     else:
-        text = "✅ YAKUNLANGAN SO'ROVLAR (oxirgi 10 ta):\n\n"
-        for req in completed[:10]:
-            text += f"🔸 #{req[0]}\n"
-            text += f"👤: @{req[7] or req[8] or req[1]}\n"
-            text += f"📝: {req[2][:60]}...\n"
-            text += f"📅: {req[5]}\n"
-            text += "─" * 25 + "\n"
+        allowed = query.from_user.id == config.ADMIN_ID
     
-    await update.message.reply_text(text, reply_markup=SUPPORT_KEYBOARD)
+    if not allowed or view not in REQUEST_LIST_VIEWS:
+        await query.answer("❌ Sizda bu huquq yo'q!")
+        return
+    
+    await query.answer()
+    text, keyboard = await build_requests_page(view, cursor, 'next' if cursor is None else direction)
+    if keyboard is None:
+        # Ro'yxat bo'sh - xabar tugmasiz qolib ketmasin, yangilash imkoniyati qoldiriladi
+        keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔄 Yangilash", callback_data=f"rq|{view}|first|0|0")
+        ]])
+    try:
+        await query.edit_message_text(text, reply_markup=keyboard)
+    except BadRequest as e:
+        # Sahifa o'zgarmagan (masalan, yangilash bosilgan) - bu xatolik emas
+        if 'message is not modified' not in str(e).lower():
+            raise
 
 async def reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Guruhda har qanday a'zo foydalanuvchiga javob berishi"""
@@ -154,15 +216,15 @@ async def reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message_text = ' '.join(args[1:])
         
         # So'rovni bazada mavjudligini tekshirish
-        request_details = get_request_details(request_id)
+        request_details = await get_request_details(request_id)
         
         if not request_details:
             await update.message.reply_text(f"❌ #{request_id} IDli so'rov topilmadi!")
             return
         
         # Foydalanuvchi ID sini olish
-        user_id = request_details[1]
-        request_user_name = request_details[8] or request_details[9] or "Foydalanuvchi"
+        user_id = request_details.user_id
+        request_user_name = request_details.username or request_details.first_name or "Foydalanuvchi"
         
         # Foydalanuvchiga javob yuborish
         try:
@@ -175,7 +237,7 @@ async def reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             
             # Bazada yangilash
-            add_reply(request_id, user.id, message_text)
+            await add_reply(request_id, user.id, message_text)
             
             # Guruhdagi xabarni yangilash
             await update.message.reply_text(
@@ -186,12 +248,14 @@ async def reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             
             # Agar foydalanuvchi admin bo'lmasa, admin qilish
-            if not is_group_member_admin(user.id):
-                add_group_admin(user.id)
+            if not await is_group_member_admin(user.id):
+                await add_group_admin(user.id)
+                invalidate_admin_cache()
                 logger.info(f"Yangi guruh admini qo'shildi: {user.id}")
             
         except Exception as e:
             logger.error(f"Foydalanuvchiga javob yuborishda xatolik: {e}")
+            await record_delivery_failure(user_id, e)
             await update.message.reply_text(
                 f"⚠️ Foydalanuvchiga javob yuborilmadi (bloklagan bo'lishi mumkin).\n"
                 f"📌 Biroq javob saqlandi: #{request_id}"
@@ -221,12 +285,12 @@ async def admins_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             text += f"{status}: @{user.username or user.first_name} (ID: {user.id})\n"
         
         # Bazadagi adminlar
-        db_admins = get_group_admins()
+        db_admins = await get_group_admins()
         if db_admins:
             text += "\n📋 Javob bera oladiganlar:\n"
             for admin in db_admins[:10]:  # Faqat 10 tasi
-                admin_id = admin[0]
-                username = admin[1] or admin[2] or f"ID: {admin_id}"
+                admin_id = admin.user_id
+                username = admin.username or admin.first_name or f"ID: {admin_id}"
                 text += f"👤 {username}\n"
         
         await update.message.reply_text(text)
@@ -235,6 +299,168 @@ async def admins_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Adminlarni olishda xatolik: {e}")
         await update.message.reply_text("❌ Adminlarni olishda xatolik yuz berdi.")
 
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Ma'lumotlar bazasini qo'lda backup qilish (faqat asosiy admin)"""
+    
+    if update.effective_user.id != config.ADMIN_ID:
+        await update.message.reply_text("❌ Sizda bu huquq yo'q!")
+        return
+    
+    progress_msg = await update.message.reply_text("⏳ Backup yaratilmoqda...")
+    result = await backup_database()
+    
+    if not result:
+        await progress_msg.edit_text("❌ Backup yaratishda xatolik yuz berdi.")
+        return
+    
+    await progress_msg.edit_text(
+        f"✅ Backup yaratildi!\n\n"
+        f"📁 Fayl: {result['path']}\n"
+        f"💾 Hajmi: {result['size'] / 1024:.1f} KB "
+        f"(baza: {result['db_size'] / 1024:.1f} KB)\n"
+        f"⏱ Davomiyligi: {result['duration']:.2f} s"
+    )
+
+async def _get_target_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Buyruqdagi ID bo'yicha (yoki oxirgi) broadcast vazifasini topish"""
+    if context.args:
+        try:
+            job = await get_broadcast_job(int(context.args[0]))
+        except ValueError:
+            await update.message.reply_text("❌ ID raqam bo'lishi kerak!")
+            return None
+    else:
+        jobs = await get_recent_broadcast_jobs(1)
+        job = jobs[0] if jobs else None
+    
+    if not job:
+        await update.message.reply_text("❌ Broadcast topilmadi!")
+    return job
+
+async def broadcast_status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Broadcast holatini ko'rish (faqat asosiy admin)"""
+    
+    if update.effective_user.id != config.ADMIN_ID:
+        await update.message.reply_text("❌ Sizda bu huquq yo'q!")
+        return
+    
+    if context.args:
+        job = await _get_target_broadcast(update, context)
+        jobs = [job] if job else []
+    else:
+        jobs = await get_recent_broadcast_jobs(5)
+        if not jobs:
+            await update.message.reply_text("📭 Hali broadcast yuborilmagan.")
+            return
+    
+    for job in jobs:
+        text = format_progress(job)
+        text += f"\n📅 Boshlangan: {format_timestamp(job.created_at)}"
+        if job.finished_at:
+            text += f"\n🏁 Tugagan: {format_timestamp(job.finished_at)}"
+        await update.message.reply_text(text)
+
+async def broadcast_pause_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Broadcastni pauza qilish (faqat asosiy admin)"""
+    
+    if update.effective_user.id != config.ADMIN_ID:
+        await update.message.reply_text("❌ Sizda bu huquq yo'q!")
+        return
+    
+    job = await _get_target_broadcast(update, context)
+    if not job:
+        return
+    
+    # Yuborish joriy qism tugagach to'xtaydi
+    if await set_broadcast_job_status(job.id, 'paused', ('pending', 'running')):
+        await update.message.reply_text(
+            f"⏸ Broadcast #{job.id} pauza qilinmoqda.\n"
+            f"Davom ettirish: /broadcast_resume {job.id}"
+        )
+    else:
+        await update.message.reply_text(f"❌ Broadcast #{job.id} bajarilmayapti ({job.status}).")
+
+async def broadcast_resume_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Pauza qilingan broadcastni davom ettirish (faqat asosiy admin)"""
+    
+    if update.effective_user.id != config.ADMIN_ID:
+        await update.message.reply_text("❌ Sizda bu huquq yo'q!")
+        return
+    
+    job = await _get_target_broadcast(update, context)
+    if not job:
+        return
+    
+    if not await set_broadcast_job_status(job.id, 'running', ('paused',)):
+        await update.message.reply_text(f"❌ Broadcast #{job.id} pauzada emas ({job.status}).")
+        return
+    
+    # Pauza oldingi vazifa tugamasdan bekor qilingan bo'lsa, o'sha vazifa davom etadi
+    if not is_broadcast_running(job.id):
+        start_broadcast(context.application, job.id)
+    await update.message.reply_text(f"▶️ Broadcast #{job.id} davom ettirildi.")
+
+async def broadcast_cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Broadcastni bekor qilish (faqat asosiy admin)"""
+    
+    if update.effective_user.id != config.ADMIN_ID:
+        await update.message.reply_text("❌ Sizda bu huquq yo'q!")
+        return
+    
+    job = await _get_target_broadcast(update, context)
+    if not job:
+        return
+    
+    if not await set_broadcast_job_status(job.id, 'cancelled', ('pending', 'running', 'paused')):
+        await update.message.reply_text(f"❌ Broadcast #{job.id} allaqachon tugagan ({job.status}).")
+        return
+    
+    await update.message.reply_text(f"🛑 Broadcast #{job.id} bekor qilindi.")
+    # Fon vazifasi bo'lmasa (pauzada edi) yakuniy natija shu yerda yuboriladi
+    if not is_broadcast_running(job.id):
+        await update.message.reply_text(format_progress(await get_broadcast_job(job.id)))
+
+EXPORT_TARGETS = ('users', 'pending', 'in_progress', 'completed')
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """So'rovlar yoki foydalanuvchilarni CSV fayl qilib yuborish (faqat asosiy admin)"""
+    
+    if update.effective_user.id != config.ADMIN_ID:
+        await update.message.reply_text("❌ Sizda bu huquq yo'q!")
+        return
+    
+    target = context.args[0].lower() if context.args else None
+    if target and target not in EXPORT_TARGETS:
+        await update.message.reply_text(
+            "❌ Noto'g'ri format!\n"
+            "To'g'ri format: /export [users|pending|in_progress|completed]\n"
+            "Argumentsiz - barcha so'rovlar"
+        )
+        return
+    
+    progress_msg = await update.message.reply_text("⏳ Eksport tayyorlanmoqda...")
+    if target == 'users':
+        result = await export_users()
+    else:
+        result = await export_requests(target)
+    
+    if not result:
+        await progress_msg.edit_text("❌ Eksport qilishda xatolik yuz berdi.")
+        return
+    
+    try:
+        with open(result['path'], 'rb') as f:
+            await update.message.reply_document(
+                document=f,
+                caption=f"📄 Eksport: {result['rows']} ta qator"
+            )
+        await progress_msg.delete()
+    except Exception as e:
+        logger.error(f"Eksport faylini yuborishda xatolik: {e}")
+        await progress_msg.edit_text("❌ Eksport faylini yuborib bo'lmadi.")
+    finally:
+        os.remove(result['path'])
+
 async def addadmin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Yangi admin qo'shish (faqat asosiy admin)"""
     
@@ -253,7 +479,8 @@ async def addadmin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         user_id = int(args[0])
-        add_group_admin(user_id)
+        await add_group_admin(user_id)
+        invalidate_admin_cache()
         
         await update.message.reply_text(f"✅ {user_id} IDli foydalanuvchi admin qilindi!")
         
@@ -281,19 +508,36 @@ async def requestinfo_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     try:
         request_id = int(args[0])
-        request_details = get_request_details(request_id)
+        request_details = await get_request_details(request_id)
         
         if not request_details:
-            await update.message.reply_text(f"❌ #{request_id} IDli so'rov topilmadi!")
+            # Eski so'rovlar arxivga ko'chirilgan bo'lishi mumkin
+            archived = await find_archived_request(request_id)
+            if not archived:
+                await update.message.reply_text(f"❌ #{request_id} IDli so'rov topilmadi!")
+                return
+            
+            archived_request = archived['request']
+            text = (
+                f"📦 So'rov #{request_id} (arxivda):\n\n"
+                f"✅ Holat: {archived_request['status']}\n"
+                f"🆔 User ID: {archived_request['user_id']}\n"
+                f"📅 Yuborilgan: {format_timestamp(archived_request['created_at'])}\n"
+                f"📝 Xabar: {archived_request['message'][:300]}...\n"
+            )
+            for reply in archived['replies']:
+                text += f"\n📩 Javob ({format_timestamp(reply['created_at'])}): {reply['reply_text'][:200]}\n"
+            
+            await update.message.reply_text(text)
             return
         
         # So'rov ma'lumotlari
-        user_id = request_details[1]
-        message = request_details[2]
-        status = request_details[3]
-        created_at = request_details[5]
-        username = request_details[8] or "Noma'lum"
-        first_name = request_details[9] or "Noma'lum"
+        user_id = request_details.user_id
+        message = request_details.message
+        status = request_details.status
+        created_at = format_timestamp(request_details.created_at)
+        username = request_details.username or "Noma'lum"
+        first_name = request_details.first_name or "Noma'lum"
         
         status_emoji = {
             'pending': '⏳',
@@ -320,34 +564,13 @@ async def requestinfo_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text(f"❌ Xatolik: {e}")
 
 async def allrequests_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Barcha so'rovlarni ko'rish"""
+    """Barcha so'rovlarni ko'rish (sahifalab)"""
     
     if update.effective_chat.id != config.GROUP_ID:
         return
     
-    requests = get_all_requests(limit=20)
-    
-    if not requests:
-        await update.message.reply_text("📭 Hozircha so'rovlar yo'q.")
-        return
-    
-    text = "📋 Oxirgi 20 ta so'rov:\n\n"
-    
-    for req in requests:
-        status_emoji = {
-            'pending': '⏳',
-            'in_progress': '🔄',
-            'completed': '✅'
-        }.get(req[1], '❓')
-        
-        text += f"{status_emoji} #{req[0]}\n"
-        text += f"👤 {req[2] or 'Nomalum'} (@{req[3] or 'Nomalum'})\n"
-        text += f"📝 {req[4][:50]}...\n"
-        text += f"📅 {req[5]}\n"
-        text += f"✏️ /reply {req[0]} [xabar]\n"
-        text += "─" * 30 + "\n"
-    
-    await update.message.reply_text(text)
+    text, keyboard = await build_requests_page('all')
+    await update.message.reply_text(text, reply_markup=keyboard)
 
 async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin xabarlarini qayta ishlash"""
@@ -359,7 +582,8 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
     
     # Admin funksiyalari
     if message_text == "📊 Statistika":
-        stats = get_statistics()
+        stats = await get_statistics()
+        cache_stats = get_subscription_cache_stats()
         
         text = (
             f"📊 Bot Statistikasi:\n\n"
@@ -368,7 +592,9 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
             f"📈 Bugungi so'rovlar: {stats['today_requests']}\n"
             f"⏳ Kutayotgan so'rovlar: {stats['pending_requests']}\n"
             f"🔄 Jarayonda: {stats['in_progress_requests']}\n"
-            f"✅ Yakunlangan: {stats['completed_requests']}\n"
+            f"✅ Yakunlangan: {stats['completed_requests']}\n\n"
+            f"🗂 Obuna keshi: {cache_stats['size']} ta, "
+            f"{cache_stats['hit_rate']:.0%} topildi ({cache_stats['hits']}/{cache_stats['misses']})\n"
         )
         
         await update.message.reply_text(text, reply_markup=ADMIN_KEYBOARD)
@@ -390,7 +616,7 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
     elif message_text == "🔍 Qidirish":
         context.user_data['waiting_for_search'] = True
         await update.message.reply_text(
-            "🔍 Qidirmoqchi bo'lgan foydalanuvchi ID, username yoki ismini yozing:",
+            "🔍 Qidirmoqchi bo'lgan foydalanuvchi ID, username, ismi yoki so'rov matnidan so'z yozing:",
             reply_markup=ReplyKeyboardRemove()
         )
     
@@ -417,62 +643,24 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
     
         # Broadcast xabarini qayta ishlash
     elif 'waiting_for_broadcast' in context.user_data and user.id == config.ADMIN_ID:
-        broadcast_message = message_text  # Xabarni saqlaymiz
-        await update.message.reply_text("⏳ Broadcast bajarilmoqda...", reply_markup=ADMIN_KEYBOARD)
-        
-        users = get_all_users()
-        success = 0
-        failed = 0
-        total_users = len(users)
-        
-        # Progress xabari
-        progress_msg = await update.message.reply_text(f"⏳ 0/{total_users}...")
-        
-        for index, user_id in enumerate(users, 1):
-            try:
-                # Kanalga obuna bo'lishni tekshirish
-                is_subscribed = await check_channel_subscription(context.bot, user_id)
-                
-                if not is_subscribed:
-                    continue  # Obuna bo'lmaganlarga yubormaymiz
-                
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=f"📢 Botdan xabar:\n\n{broadcast_message}\n\n"
-                         f"📢 @{config.CHANNEL_USERNAMES[0]} kanaliga obuna bo'ling!"
-                )
-                success += 1
-                
-                # Har 10ta xabardan keyin progress yangilash
-                if index % 10 == 0:
-                    await progress_msg.edit_text(
-                        f"⏳ {index}/{total_users} yuborildi...\n"
-                        f"✅ Muvaffaqiyatli: {success}\n"
-                        f"❌ Xatolik: {failed}"
-                    )
-                
-                # Tezlikni cheklash (sekundiga 5ta xabar)
-                if index % 5 == 0:
-                    await asyncio.sleep(1)
-                    
-            except Exception as e:
-                failed += 1
-                logger.error(f"Xabar yuborishda xatolik {user_id}: {e}")
-        
-        # Progress xabarini o'chirish
-        await progress_msg.delete()
-        
         del context.user_data['waiting_for_broadcast']
         
+        # Vazifa va qabul qiluvchilar bazaga yoziladi - qayta ishga tushsa davom etadi
+        job_id = await create_broadcast_job(message_text, user.id, update.effective_chat.id)
+        job = await get_broadcast_job(job_id)
         await update.message.reply_text(
-            f"✅ Broadcast yakunlandi!\n\n"
-            f"📊 Statistikalar:\n"
-            f"• 👥 Jami foydalanuvchilar: {total_users}\n"
-            f"• ✅ Muvaffaqiyatli: {success}\n"
-            f"• ❌ Xatolik: {failed}\n"
-            f"• 📤 Yuborilmagan (obuna emas): {total_users - success - failed}",
+            f"⏳ Broadcast #{job_id} fonda boshlandi.\n"
+            f"Boshqarish: /broadcast_status, /broadcast_pause, /broadcast_cancel",
             reply_markup=ADMIN_KEYBOARD
         )
+        
+        # Progress xabari
+        progress_msg = await update.message.reply_text(format_progress(job))
+        await set_broadcast_progress_message(job_id, progress_msg.message_id)
+        
+        # Fon vazifasi - handler kutmaydi, bot boshqa xabarlarga javob berishda davom etadi.
+        # Yakuniy natija run_broadcast_job ichida yuboriladi
+        start_broadcast(context.application, job_id)
     
         # Qidiruvni qayta ishlash
     elif 'waiting_for_search' in context.user_data and user.id == config.ADMIN_ID:
@@ -481,18 +669,21 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
             del context.user_data['waiting_for_search']
             return
             
-        results = search_user(message_text.strip())
+        results = await search_user(message_text.strip())
+        request_results = await search_requests(message_text.strip())
         
-        if not results:
-            text = "❌ Hech qanday foydalanuvchi topilmadi."
+        if not results and not request_results:
+            text = "❌ Hech narsa topilmadi."
+        elif not results:
+            text = "❌ Hech qanday foydalanuvchi topilmadi.\n"
         else:
             text = f"🔍 Natijalar ({len(results)} ta):\n\n"
             for user_data in results[:10]:  # Faqat 10 tasini ko'rsatish
-                user_id = user_data[1]
-                username = f"@{user_data[2]}" if user_data[2] else "Yo'q"
-                first_name = user_data[3] if user_data[3] else "Yo'q"
-                last_name = user_data[4] if user_data[4] else "Yo'q"
-                joined_date = user_data[5]
+                user_id = user_data.user_id
+                username = f"@{user_data.username}" if user_data.username else "Yo'q"
+                first_name = user_data.first_name or "Yo'q"
+                last_name = user_data.last_name or "Yo'q"
+                joined_date = format_timestamp(user_data.joined_date)
                 
                 text += f"👤 ID: {user_id}\n"
                 text += f"📱 Username: {username}\n"
@@ -503,7 +694,17 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
                 text += "─" * 25 + "\n"
         
         if len(results) > 10:
-            text += f"\n...va yana {len(results) - 10} ta natija"
+            text += f"\n...va yana {len(results) - 10} ta natija\n"
+        
+        # So'rov va javob matnlaridagi mosliklar
+        if request_results:
+            text += f"\n📨 So'rovlar ({len(request_results)} ta):\n\n"
+            for request_id, status, created_at, source, snippet in request_results[:10]:
+                source_label = "📩 Javobda" if source == 'reply' else "📝 So'rovda"
+                text += f"🔸 #{request_id} ({status})\n"
+                text += f"{source_label}: {snippet}\n"
+                text += f"📅: {format_timestamp(created_at)}\n"
+                text += "─" * 25 + "\n"
         
         del context.user_data['waiting_for_search']
         
@@ -513,7 +714,7 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
     elif 'waiting_for_reply_id' in context.user_data and user.id == config.ADMIN_ID:
         try:
             request_id = int(message_text)
-            request_details = get_request_details(request_id)
+            request_details = await get_request_details(request_id)
             
             if not request_details:
                 await update.message.reply_text(f"❌ #{request_id} IDli so'rov topilmadi!", reply_markup=SUPPORT_KEYBOARD)
@@ -526,8 +727,8 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
             
             await update.message.reply_text(
                 f"✅ So'rov #{request_id} topildi!\n"
-                f"👤 Foydalanuvchi: @{request_details[8] or request_details[9] or 'Nomalum'}\n"
-                f"📝 So'rov: {request_details[2][:200]}...\n\n"
+                f"👤 Foydalanuvchi: @{request_details.username or request_details.first_name or 'Nomalum'}\n"
+                f"📝 So'rov: {request_details.message[:200]}...\n\n"
                 f"Endi javobingizni yozing:",
                 reply_markup=ReplyKeyboardRemove()
             )
@@ -541,11 +742,11 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
         reply_text = message_text
         
         # Bazaga saqlash
-        add_reply(request_id, user.id, reply_text)
+        await add_reply(request_id, user.id, reply_text)
         
         # Foydalanuvchiga yuborish
-        request_details = get_request_details(request_id)
-        user_id = request_details[1]
+        request_details = await get_request_details(request_id)
+        user_id = request_details.user_id
         
         try:
             await context.bot.send_message(
@@ -557,6 +758,7 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
             reply_status = "✅ Foydalanuvchiga javob yuborildi"
         except Exception as e:
             logger.error(f"Foydalanuvchiga javob yuborishda xatolik: {e}")
+            await record_delivery_failure(user_id, e)
             reply_status = "⚠️ Foydalanuvchiga javob yuborilmadi (bloklagan bo'lishi mumkin)"
         
         # Rejimni tozalash
@@ -577,12 +779,6 @@ async def handle_admin_messages(update: Update, context: ContextTypes.DEFAULT_TY
             reply_markup=ADMIN_KEYBOARD
         )
 
-# Import qilish uchun kerak
-async def check_channel_subscription(bot, user_id):
-    """Kanal obunasini tekshirish"""
-    from utils.channel_check import check_channel_subscription as check_sub
-    return await check_sub(bot, user_id)
-
 def setup_admin_handlers(application):
     """Admin va guruh handlerlarini sozlash"""
     # Faqat command handlerlarni qo'shamiz
@@ -590,10 +786,17 @@ def setup_admin_handlers(application):
     application.add_handler(CommandHandler("requestinfo", requestinfo_command))
     application.add_handler(CommandHandler("allrequests", allrequests_command))
     application.add_handler(CommandHandler("admins", admins_command))
+    application.add_handler(CallbackQueryHandler(requests_page_callback, pattern=r"^rq\|"))
     
     # Faqat asosiy admin uchun
     application.add_handler(CommandHandler("addadmin", addadmin_command))
+    application.add_handler(CommandHandler("backup", backup_command))
+    application.add_handler(CommandHandler("export", export_command))
     application.add_handler(CommandHandler("admin", admin_command))
+    application.add_handler(CommandHandler("broadcast_status", broadcast_status_command))
+    application.add_handler(CommandHandler("broadcast_pause", broadcast_pause_command))
+    application.add_handler(CommandHandler("broadcast_resume", broadcast_resume_command))
+    application.add_handler(CommandHandler("broadcast_cancel", broadcast_cancel_command))
     
     # MESSAGE HANDLERLARNI O'CHIRAMIZ - ular message_handler.py da
     # application.add_handler(MessageHandler(
@@ -0,0 +1,35 @@
+from telegram import Update
+from telegram.ext import ContextTypes, ChatMemberHandler
+import config
+import logging
+from utils.async_db import save_channel_statuses
+from utils.channel_check import invalidate_subscription
+
+logger = logging.getLogger(__name__)
+
+# Kuzatiladigan kanallar (kichik harflarda)
+TRACKED_CHANNELS = {channel.lower() for channel in config.CHANNEL_USERNAMES}
+
+async def track_channel_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Kanal a'zoligi o'zgarganda (obuna/chiqish) a'zolar jadvalini yangilash"""
+    member_update = update.chat_member
+    channel = (member_update.chat.username or "").lower()
+    
+    if channel not in TRACKED_CHANNELS:
+        return
+    
+    user_id = member_update.new_chat_member.user.id
+    status = member_update.new_chat_member.status
+    
+    await save_channel_statuses([(channel, user_id, status)])
+    # Keshdagi eski natija o'chiriladi - keyingi tekshiruv jadvaldan o'qiydi
+    invalidate_subscription(user_id)
+    
+    logger.info(f"📢 @{channel}: {user_id} - {member_update.old_chat_member.status} → {status}")
+
+def setup_member_handlers(application):
+    """Kanal a'zoligi handlerlarini sozlash
+    
+    chat_member yangilanishlari faqat bot kanalda admin bo'lsa keladi.
+    """
+    application.add_handler(ChatMemberHandler(track_channel_member, ChatMemberHandler.CHAT_MEMBER))
@@ -1,10 +1,15 @@
+import asyncio
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, MessageHandler, filters
 import config
 import logging
-from utils.database import update_user_activity, add_request, get_user_requests
-from utils.time_utils import get_current_time, format_time, get_response_time_estimate, get_working_hours_message
+from utils.async_db import (
+    update_user_activity, add_request, append_to_request, get_user_requests, get_status_counts, get_request_details
+)
+from utils.time_utils import get_current_time, format_time, format_timestamp, get_response_time_estimate, get_working_hours_message
 from utils.channel_check import check_channel_subscription
+from utils.notifier import group_notifier
+from utils.dedup import request_index, signature
 from handlers.user_handlers import USER_KEYBOARD
 from handlers.admin_handlers import ADMIN_KEYBOARD, handle_admin_messages as admin_handle_messages
 
@@ -18,7 +23,7 @@ async def route_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.info(f"📩 Yangi xabar: {user.id} - {message_text}")
     
     # Foydalanuvchi faolligini yangilash
-    update_user_activity(user.id)
+    await update_user_activity(user.id)
     
     # 1. AVVAL context.user_data ni tekshirish (BARCHA HOLATLAR UCHUN)
     if 'waiting_for_request' in context.user_data:
@@ -75,33 +80,55 @@ async def handle_user_request(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
     
+    # Takroriy so'rovni tekshirish - faqat hali ochiq so'rovlar hisobga olinadi
+    sig = await asyncio.to_thread(signature, message_text)
+    duplicate = request_index.find_duplicate(user.id, sig)
+    if duplicate:
+        existing = await get_request_details(duplicate.request_id)
+        if not existing or existing.status not in ('pending', 'in_progress'):
+            request_index.remove(duplicate.request_id)
+            duplicate = None
+    
+    if duplicate and duplicate.user_id == user.id:
+        # O'zining ochiq so'roviga o'xshash - yangi so'rov yaratilmaydi, matn unga qo'shiladi
+        if await append_to_request(duplicate.request_id, user.id, message_text):
+            logger.info(
+                f"🔁 Takroriy so'rov birlashtirildi: {user.id} -> #{duplicate.request_id} "
+                f"({duplicate.similarity:.0%})"
+            )
+            group_notifier.notify(context.bot, duplicate.request_id, user, message_text, addition=True)
+            keyboard = ADMIN_KEYBOARD if user.id == config.ADMIN_ID else USER_KEYBOARD
+            await update.message.reply_text(
+                f"ℹ️ {user.first_name}, sizda shunga o'xshash #{duplicate.request_id} raqamli "
+                f"so'rov allaqachon ko'rib chiqilmoqda.\n\n"
+                f"📌 Xabaringiz shu so'rovga qo'shildi. Holatini '📋 Mening so'rovlarim' tugmasi orqali kuzatishingiz mumkin.",
+                reply_markup=keyboard
+            )
+            del context.user_data['waiting_for_request']
+            return
+        # Shu orada yopilgan - odatdagidek yangi so'rov yaratiladi
+        request_index.remove(duplicate.request_id)
+        duplicate = None
+    
+    # Boshqa foydalanuvchining ochiq so'roviga o'xshash bo'lsa - belgilanadi
+    duplicate_of = duplicate.request_id if duplicate else None
+    
     try:
         # So'rovni bazaga saqlash
-        from utils.database import add_request
-        request_id = add_request(user.id, message_text)
+        request_id = await add_request(user.id, message_text, duplicate_of)
+        request_index.add(request_id, user.id, sig)
         logger.info(f"✅ So'rov saqlandi: #{request_id}")
         
-        # Guruhga yuborish
-        await context.bot.send_message(
-            chat_id=config.GROUP_ID,
-            text=f"🆕 YANGI SO'ROV #{request_id}\n\n"
-                 f"👤 Foydalanuvchi: @{user.username or user.first_name}\n"
-                 f"🆔 User ID: {user.id}\n"
-                 f"📱 Username: @{user.username or 'Yoq'}\n"
-                 f"📅 Vaqt: {format_time(get_current_time())}\n\n"
-                 f"📝 XABAR:\n{message_text}\n\n"
-                 f"✏️ JAVOB BERISH:\n"
-                 f"/reply {request_id} [javob matni]\n\n"
-                 f"📄 SO'ROV MA'LUMOTI:\n"
-                 f"/requestinfo {request_id}\n\n"
-                 f"📋 BARCHA SO'ROVLAR:\n"
-                 f"/allrequests",
-            disable_web_page_preview=True
-        )
-        logger.info(f"✅ Guruhga yuborildi: #{request_id}")
+        # Guruhga bildirishnoma - navbatga qo'shiladi, yuklama oshsa digestga birlashtiriladi
+        group_notifier.notify(context.bot, request_id, user, message_text, duplicate_of)
         
     except Exception as e:
-        logger.error(f"❌ Guruhga xabar yuborishda xatolik: {e}")
+        logger.error(f"❌ So'rovni saqlashda xatolik: {e}")
+        # Rejim saqlanadi - foydalanuvchi xabarni qayta yuborishi mumkin
+        await update.message.reply_text(
+            "❌ So'rovni saqlashda xatolik yuz berdi. Iltimos, birozdan keyin qaytadan yuboring."
+        )
+        return
     
     # Foydalanuvchiga tasdiqlash
     response_time = get_response_time_estimate()
@@ -192,9 +219,7 @@ async def handle_user_message(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def show_user_requests(update: Update, context: ContextTypes.DEFAULT_TYPE, user):
     """Foydalanuvchining so'rovlarini ko'rsatish"""
-    from utils.database import get_user_requests
-    
-    requests = get_user_requests(user.id)
+    requests = await get_user_requests(user.id)
     
     if not requests:
         text = (
@@ -209,27 +234,26 @@ async def show_user_requests(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 'pending': '⏳',
                 'in_progress': '🔄',
                 'completed': '✅'
-            }.get(req[3], '❓')
+            }.get(req.status, '❓')
             
-            text += f"{status_emoji} So'rov #{req[0]}:\n"
-            text += f"📝 {req[2][:100]}...\n"
-            text += f"📊 Holat: {req[3]}\n"
-            text += f"📅 Sana: {req[5]}\n"
+            text += f"{status_emoji} So'rov #{req.id}:\n"
+            text += f"📝 {req.message}...\n"
+            text += f"📊 Holat: {req.status}\n"
+            text += f"📅 Sana: {format_timestamp(req.created_at)}\n"
             
             # Agar javob berilgan bo'lsa
-            if req[3] == 'completed' and req[6]:  # admin_reply maydoni
-                text += f"📩 Admin javobi: {req[6][:150]}...\n"
+            if req.status == 'completed' and req.last_reply:
+                text += f"📩 Admin javobi: {req.last_reply}...\n"
             
             text += "─" * 25 + "\n"
         
-        # Statistik ma'lumot
-        pending = sum(1 for r in requests if r[3] == 'pending')
-        completed = sum(1 for r in requests if r[3] == 'completed')
+        # Statistik ma'lumot (faqat oxirgi 10 tasi emas, barcha so'rovlar bo'yicha)
+        counts = await get_status_counts(user.id)
         
         text += f"\n📊 Statistikangiz:\n"
-        text += f"• ⏳ Kutayotgan: {pending}\n"
-        text += f"• ✅ Yakunlangan: {completed}\n"
-        text += f"• 📨 Umumiy: {len(requests)}\n\n"
+        text += f"• ⏳ Kutayotgan: {counts['pending']}\n"
+        text += f"• ✅ Yakunlangan: {counts['completed']}\n"
+        text += f"• 📨 Umumiy: {sum(counts.values())}\n\n"
         text += f"➕ Yangi so'rov: '📨 Murojaat yuborish'"
     
     await update.message.reply_text(text, reply_markup=USER_KEYBOARD)
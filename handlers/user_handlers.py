@@ -2,12 +2,13 @@ from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, CommandHandler
 import config
 import logging
-from utils.database import (
-    add_user, update_user_activity, get_user_by_id
+from utils.async_db import (
+    add_user, update_user_activity, get_user_requests,
+    get_status_counts
 )
-from utils.channel_check import check_channel_subscription
+from utils.channel_check import check_channel_subscription, invalidate_subscription
 from utils.time_utils import (
-    get_current_time, format_time, 
+    get_current_time, format_time, format_timestamp,
     get_working_hours_message, get_response_time_estimate
 )
 
@@ -25,9 +26,11 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
     # Foydalanuvchi faolligini yangilash
-    update_user_activity(user.id)
+    await update_user_activity(user.id)
     
-    # BARCHA kanallarga obuna bo'lishni tekshirish
+    # BARCHA kanallarga obuna bo'lishni tekshirish - /start da keshdagi
+    # natija ishlatilmaydi (foydalanuvchi hozirgina obuna bo'lgan bo'lishi mumkin)
+    invalidate_subscription(user.id)
     is_subscribed = await check_channel_subscription(context.bot, user.id)
     
     if not is_subscribed:
@@ -47,7 +50,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Foydalanuvchini bazaga qo'shish yoki yangilash
-    add_user(user.id, user.username, user.first_name, user.last_name)
+    await add_user(user.id, user.username, user.first_name, user.last_name)
     
     current_time = get_current_time()
     time_str = format_time(current_time)
@@ -67,9 +70,8 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
     else:
         # Oddiy foydalanuvchining oldingi so'rovlari soni
-        from utils.database import get_user_requests
-        user_requests = get_user_requests(user.id)
-        request_count = len(user_requests) if user_requests else 0
+        counts = await get_status_counts(user.id)
+        request_count = sum(counts.values())
         
         welcome_text = (
             f"👋 Salom {user.first_name}! @aisroilov support botiga xush kelibsiz!\n\n"
@@ -79,14 +81,11 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         if request_count > 0:
             # So'rovlari bor foydalanuvchi uchun
-            pending_count = sum(1 for req in user_requests if req[3] == 'pending')
-            completed_count = sum(1 for req in user_requests if req[3] == 'completed')
-            
             welcome_text += (
                 f"📊 Sizning statistikangiz:\n"
                 f"• 📨 Umumiy so'rovlar: {request_count}\n"
-                f"• ⏳ Kutayotgan: {pending_count}\n"
-                f"• ✅ Yakunlangan: {completed_count}\n\n"
+                f"• ⏳ Kutayotgan: {counts['pending']}\n"
+                f"• ✅ Yakunlangan: {counts['completed']}\n\n"
             )
         else:
             # Yangi foydalanuvchi uchun
@@ -109,7 +108,7 @@ async def time_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
     # Foydalanuvchi faolligini yangilash
-    update_user_activity(user.id)
+    await update_user_activity(user.id)
     
     current_time = get_current_time()
     time_str = format_time(current_time)
@@ -134,11 +133,9 @@ async def myrequests_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user = update.effective_user
     
     # Foydalanuvchi faolligini yangilash
-    update_user_activity(user.id)
-    
-    from utils.database import get_user_requests
+    await update_user_activity(user.id)
     
-    requests = get_user_requests(user.id)
+    requests = await get_user_requests(user.id)
     
     if not requests:
         text = (
@@ -153,27 +150,26 @@ async def myrequests_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 'pending': '⏳',
                 'in_progress': '🔄',
                 'completed': '✅'
-            }.get(req[3], '❓')
+            }.get(req.status, '❓')
             
-            text += f"{status_emoji} So'rov #{req[0]}:\n"
-            text += f"📝 {req[2][:100]}...\n"
-            text += f"📊 Holat: {req[3]}\n"
-            text += f"📅 Sana: {req[5]}\n"
+            text += f"{status_emoji} So'rov #{req.id}:\n"
+            text += f"📝 {req.message}...\n"
+            text += f"📊 Holat: {req.status}\n"
+            text += f"📅 Sana: {format_timestamp(req.created_at)}\n"
             
             # Agar javob berilgan bo'lsa
-            if req[3] == 'completed' and req[6]:  # admin_reply maydoni
-                text += f"📩 Admin javobi: {req[6][:150]}...\n"
+            if req.status == 'completed' and req.last_reply:
+                text += f"📩 Admin javobi: {req.last_reply}...\n"
             
             text += "─" * 25 + "\n"
         
-        # Statistik ma'lumot
-        pending = sum(1 for r in requests if r[3] == 'pending')
-        completed = sum(1 for r in requests if r[3] == 'completed')
+        # Statistik ma'lumot (faqat oxirgi 10 tasi emas, barcha so'rovlar bo'yicha)
+        counts = await get_status_counts(user.id)
         
         text += f"\n📊 Statistikangiz:\n"
-        text += f"• ⏳ Kutayotgan: {pending}\n"
-        text += f"• ✅ Yakunlangan: {completed}\n"
-        text += f"• 📨 Umumiy: {len(requests)}\n\n"
+        text += f"• ⏳ Kutayotgan: {counts['pending']}\n"
+        text += f"• ✅ Yakunlangan: {counts['completed']}\n"
+        text += f"• 📨 Umumiy: {sum(counts.values())}\n\n"
         text += f"➕ Yangi so'rov: '📨 Murojaat yuborish'"
     
     from handlers.admin_handlers import ADMIN_KEYBOARD
@@ -185,7 +181,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
     # Foydalanuvchi faolligini yangilash
-    update_user_activity(user.id)
+    await update_user_activity(user.id)
     
     text = (
         f"ℹ️ {user.first_name}, @aisroilov support bot yordami:\n\n"
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import sys
 import os
@@ -7,10 +8,18 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
 from telegram import BotCommand
 import config
-from utils.database import init_db
+from utils.database import init_db, close_connections
+from utils import async_db
 from utils.keep_alive import start_keep_alive
+from utils.broadcast import resume_broadcasts, stop_broadcasts
+from utils.update_processor import update_processor
+from utils.outbound import OutboundScheduler
+from utils.notifier import group_notifier
+from utils.flood_control import setup_flood_control
+from utils.dedup import request_index
 from handlers.user_handlers import setup_user_handlers
 from handlers.admin_handlers import setup_admin_handlers
+from handlers.member_handler import setup_member_handlers
 from handlers.message_handler import route_messages  # ✅ TO'G'RIDAN FUNKSIYANI IMPORT QILISH
 
 # Logging
@@ -33,8 +42,44 @@ async def post_init(application):
         BotCommand("requestinfo", "So'rov haqida ma'lumot"),
         BotCommand("allrequests", "Barcha so'rovlarni ko'rish"),
         BotCommand("admins", "Guruh adminlarini ko'rish"),
+        BotCommand("backup", "Bazani backup qilish (faqat admin)"),
+        BotCommand("export", "So'rovlar/foydalanuvchilarni CSV ga eksport (faqat admin)"),
+        BotCommand("broadcast_status", "Broadcast holati (faqat admin)"),
+        BotCommand("broadcast_pause", "Broadcastni pauza qilish (faqat admin)"),
+        BotCommand("broadcast_resume", "Broadcastni davom ettirish (faqat admin)"),
+        BotCommand("broadcast_cancel", "Broadcastni bekor qilish (faqat admin)"),
     ]
     await application.bot.set_my_commands(commands)
+    
+    # Takroriy so'rovlar indeksi - oxirgi ochiq so'rovlar bilan
+    await asyncio.to_thread(request_index.load_recent)
+
+async def resume_broadcasts_job(context):
+    """Oldingi ishga tushishda tugallanmagan broadcastlarni davom ettiradi (Application ishlab turganda)"""
+    await resume_broadcasts(context.application)
+
+async def flush_activity_job(context):
+    """Faollik buferini davriy ravishda bazaga yozadi"""
+    await async_db.flush_user_activity()
+
+async def backup_job(context):
+    """Bazani davriy ravishda backup qiladi"""
+    await async_db.backup_database()
+
+async def retention_job(context):
+    """Eski so'rovlarni davriy ravishda arxivlab tozalaydi"""
+    await async_db.cleanup_old_data()
+
+async def post_stop(application):
+    """Bot to'xtaganda fon broadcastlarini to'xtatadi va navbatdagi bildirishnomalarni yuboradi"""
+    await stop_broadcasts()
+    await group_notifier.stop(application.bot)
+
+async def post_shutdown(application):
+    """Bot to'xtaganda resurslarni bo'shatadi"""
+    await async_db.flush_user_activity()
+    async_db.shutdown()
+    close_connections()
 
 def main():
     logger.info("Bot ishga tushmoqda...")
@@ -43,11 +88,18 @@ def main():
         application = Application.builder() \
             .token(config.BOT_TOKEN) \
             .post_init(post_init) \
+            .post_stop(post_stop) \
+            .post_shutdown(post_shutdown) \
+            .rate_limiter(OutboundScheduler()) \
+            .concurrent_updates(update_processor) \
             .build()
 
         init_db()
         
         # 🔥 MUHIM: HANDLERLAR TARTIBI
+        # 0. Flood nazorati - group -1, barcha handlerlardan oldin ishlaydi
+        setup_flood_control(application)
+        
         # 1. BIRINCHI - Message handlerlarni qo'shamiz
         # BU eng BIRINCHI bo'lishi kerak, chunki u barcha xabarlarni qabul qiladi
         application.add_handler(MessageHandler(
@@ -58,6 +110,31 @@ def main():
         # 2. Command handlerlarni sozlash
         setup_user_handlers(application)     # /start, /time, /myrequests, /help, /cancel
         setup_admin_handlers(application)    # /admin, /reply, /requestinfo, etc.
+        setup_member_handlers(application)   # kanal obunalari (chat_member)
+
+        # 3. Davriy ishlar
+        if application.job_queue:
+            application.job_queue.run_once(resume_broadcasts_job, when=0)
+            application.job_queue.run_repeating(
+                flush_activity_job,
+                interval=config.ACTIVITY_FLUSH_INTERVAL,
+                first=config.ACTIVITY_FLUSH_INTERVAL
+            )
+            application.job_queue.run_repeating(
+                backup_job,
+                interval=config.BACKUP_INTERVAL_HOURS * 3600,
+                first=600
+            )
+            application.job_queue.run_repeating(
+                retention_job,
+                interval=config.RETENTION_INTERVAL_HOURS * 3600,
+                first=1800
+            )
+        else:
+            logger.warning(
+                "JobQueue mavjud emas - davriy ishlar (faollik, backup, tozalash) va "
+                "broadcastlarni davom ettirish o'chirilgan"
+            )
 
         start_keep_alive()
 
@@ -67,7 +144,7 @@ def main():
         logger.info(f"📢 Kanallar: {config.CHANNEL_USERNAMES}")
         
         application.run_polling(
-            allowed_updates=["message"], 
+            allowed_updates=["message", "callback_query", "chat_member"], 
             drop_pending_updates=True
         )
         
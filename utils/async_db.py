@@ -0,0 +1,106 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import config
+from utils import database, backup, retention, export
+
+logger = logging.getLogger(__name__)
+
+# Yozish uchun bitta ajratilgan thread - SQLite da bir vaqtda bitta yozuvchi
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+# O'qish uchun alohida threadlar - sekin admin so'rovlari yozuvlarni kutdirmaydi
+_read_executor = ThreadPoolExecutor(
+    max_workers=config.DB_READ_THREADS, thread_name_prefix="db-read"
+)
+
+# Navbat chegarasi - to'lganda chaqiruvchi bo'sh joy kutadi
+_write_slots = asyncio.Semaphore(config.DB_MAX_PENDING_WRITES)
+_read_slots = asyncio.Semaphore(config.DB_MAX_PENDING_READS)
+
+async def _run(executor, slots, func, *args, **kwargs):
+    """Funksiyani DB threadida bajarish (event loop bloklanmaydi)"""
+    async with slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+def _reader(func):
+    """O'qish funksiyasining async versiyasi"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await _run(_read_executor, _read_slots, func, *args, **kwargs)
+    return wrapper
+
+def _writer(func):
+    """Yozish funksiyasining async versiyasi"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await _run(_write_executor, _write_slots, func, *args, **kwargs)
+    return wrapper
+
+# Yozish funksiyalari
+add_user = _writer(database.add_user)
+add_request = _writer(database.add_request)
+append_to_request = _writer(database.append_to_request)
+add_reply = _writer(database.add_reply)
+update_request_status = _writer(database.update_request_status)
+add_group_admin = _writer(database.add_group_admin)
+remove_group_admin = _writer(database.remove_group_admin)
+flush_user_activity = _writer(database.flush_user_activity)
+save_channel_statuses = _writer(database.save_channel_statuses)
+create_broadcast_job = _writer(database.create_broadcast_job)
+set_broadcast_job_status = _writer(database.set_broadcast_job_status)
+set_broadcast_progress_message = _writer(database.set_broadcast_progress_message)
+record_broadcast_results = _writer(database.record_broadcast_results)
+set_delivery_state = _writer(database.set_delivery_state)
+
+# O'qish funksiyalari
+get_statistics = _reader(database.get_statistics)
+get_status_counts = _reader(database.get_status_counts)
+search_user = _reader(database.search_user)
+search_requests = _reader(database.search_requests)
+get_requests_page = _reader(database.get_requests_page)
+get_request_details = _reader(database.get_request_details)
+get_all_users = _reader(database.get_all_users)
+get_user_requests = _reader(database.get_user_requests)
+get_all_requests = _reader(database.get_all_requests)
+is_group_member_admin = _reader(database.is_group_member_admin)
+get_active_admin_ids = _reader(database.get_active_admin_ids)
+get_group_admins = _reader(database.get_group_admins)
+get_recent_requests = _reader(database.get_recent_requests)
+get_request_replies = _reader(database.get_request_replies)
+get_user_by_id = _reader(database.get_user_by_id)
+get_daily_stats = _reader(database.get_daily_stats)
+get_channel_statuses = _reader(database.get_channel_statuses)
+get_broadcast_job = _reader(database.get_broadcast_job)
+get_unfinished_broadcast_jobs = _reader(database.get_unfinished_broadcast_jobs)
+get_recent_broadcast_jobs = _reader(database.get_recent_broadcast_jobs)
+get_pending_recipients = _reader(database.get_pending_recipients)
+find_archived_request = _reader(retention.find_archived_request)
+
+async def update_user_activity(user_id):
+    """Faollikni buferga yozish - bufer to'lganda DB threadida yoziladi"""
+    if database.buffer_user_activity(user_id):
+        await flush_user_activity()
+
+async def backup_database():
+    """Backup - alohida threadda (o'z ulanishlari bilan, DB navbatlarini band qilmaydi)"""
+    return await asyncio.to_thread(backup.backup_database)
+
+async def cleanup_old_data(days=None):
+    """Arxivlab tozalash - alohida threadda, qisqa tranzaksiyalar bilan"""
+    return await asyncio.to_thread(retention.cleanup_old_data, days)
+
+async def export_requests(status=None):
+    """So'rovlar eksporti - alohida threadda, qatorlar qismlab o'qiladi"""
+    return await asyncio.to_thread(export.export_requests, status)
+
+async def export_users():
+    """Foydalanuvchilar eksporti - alohida threadda, qatorlar qismlab o'qiladi"""
+    return await asyncio.to_thread(export.export_users)
+
+def shutdown():
+    """DB threadlarini to'xtatish (navbatdagi ishlar tugashini kutadi)"""
+    _write_executor.shutdown(wait=True)
+    _read_executor.shutdown(wait=True)
+    logger.info("✅ DB threadlari to'xtatildi")
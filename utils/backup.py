@@ -0,0 +1,116 @@
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta
+import config
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "tibshifo_support_"
+
+class BackupRestartLimit(Exception):
+    """Backup yozuvlar sababli juda ko'p marta qayta boshlandi"""
+
+def _copy_database(target_path):
+    """Bazani SQLite backup API orqali bosqichma-bosqich nusxalash"""
+    source = sqlite3.connect(config.DATABASE_NAME, timeout=config.DB_BUSY_TIMEOUT)
+    target = sqlite3.connect(target_path)
+    state = {'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        # Boshqa ulanish yozsa SQLite nusxani boshidan boshlaydi - buni sanaymiz
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > config.BACKUP_MAX_RESTARTS:
+                raise BackupRestartLimit()
+        state['remaining'] = remaining
+
+    try:
+        try:
+            source.backup(
+                target,
+                pages=config.BACKUP_PAGES_PER_STEP,
+                progress=progress,
+                sleep=config.BACKUP_STEP_SLEEP
+            )
+        except BackupRestartLimit:
+            # Yozuvlar ko'p - bitta qadamda nusxalaymiz. WAL rejimida bu faqat
+            # o'qish tranzaksiyasi, yozuvchilar bloklanmaydi
+            logger.warning("⚠️ Backup tez-tez qayta boshlandi, bitta qadamda nusxalanmoqda")
+            source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def _compress(path):
+    """Tayyor nusxani gzip qilish va asl faylni o'chirish"""
+    compressed_path = f"{path}.gz"
+    with open(path, 'rb') as f_in, gzip.open(compressed_path, 'wb', compresslevel=6) as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+    os.remove(path)
+    return compressed_path
+
+def rotate_backups():
+    """Eski backuplarni o'chirish (soni va yoshi bo'yicha)"""
+    if not os.path.isdir(config.BACKUP_DIR):
+        return 0
+
+    backups = sorted(
+        (name for name in os.listdir(config.BACKUP_DIR)
+         if name.startswith(BACKUP_PREFIX) and name.endswith(".db.gz")),
+        reverse=True  # nomda vaqt bor - eng yangilari birinchi
+    )
+    cutoff = time.time() - timedelta(days=config.BACKUP_KEEP_DAYS).total_seconds()
+
+    removed = 0
+    for index, name in enumerate(backups):
+        path = os.path.join(config.BACKUP_DIR, name)
+        if index >= config.BACKUP_KEEP_COUNT or os.path.getmtime(path) < cutoff:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                logger.error(f"❌ Eski backupni o'chirishda xatolik {name}: {e}")
+
+    if removed:
+        logger.info(f"🧹 {removed} ta eski backup o'chirildi")
+    return removed
+
+def backup_database():
+    """Ma'lumotlar bazasini onlayn backup qilish
+
+    Natija: {'path', 'size', 'db_size', 'duration'} yoki xatolikda None
+    """
+    os.makedirs(config.BACKUP_DIR, exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    backup_file = os.path.join(config.BACKUP_DIR, f"{BACKUP_PREFIX}{timestamp}.db")
+    started = time.monotonic()
+
+    try:
+        _copy_database(backup_file)
+        db_size = os.path.getsize(backup_file)
+        backup_file = _compress(backup_file)
+    except Exception as e:
+        logger.error(f"❌ Backup yaratishda xatolik: {e}")
+        for path in (backup_file, f"{backup_file}.gz"):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+
+    result = {
+        'path': backup_file,
+        'size': os.path.getsize(backup_file),
+        'db_size': db_size,
+        'duration': time.monotonic() - started
+    }
+    logger.info(
+        f"✅ Backup yaratildi: {backup_file} "
+        f"({result['size'] / 1024:.1f} KB, {result['duration']:.2f} s)"
+    )
+
+    rotate_backups()
+    return result
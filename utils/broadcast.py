@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import time
+from telegram.error import RetryAfter, Forbidden, BadRequest, TimedOut, NetworkError
+import config
+from utils import async_db
+from utils.channel_check import check_channel_subscription
+from utils.delivery import delivery_state_for
+from utils.outbound import TokenBucket, LANE_BROADCAST
+
+logger = logging.getLogger(__name__)
+
+# Broadcastlar uchun umumiy tezlik chegarasi. Telegram limitlari va boshqa
+# xabarlar oldidagi navbat esa OutboundScheduler (LANE_BROADCAST) da
+send_bucket = TokenBucket(config.BROADCAST_RATE, config.BROADCAST_BURST)
+
+# Fonda bajarilayotgan broadcastlar: job_id -> asyncio.Task (Application.create_task orqali)
+_tasks = {}
+_shutting_down = False
+
+def _should_stop(application):
+    """Bot to'xtayaptimi - qismlar orasida tekshiriladi, joriy qism oxirigacha yuboriladi"""
+    # Application.stop() create_task vazifalarini post_stop dan oldin kutadi - running ham tekshiriladi
+    return _shutting_down or not application.running
+
+def format_broadcast_text(text):
+    """Foydalanuvchiga yuboriladigan broadcast matni"""
+    return (
+        f"📢 Botdan xabar:\n\n{text}\n\n"
+        f"📢 @{config.CHANNEL_USERNAMES[0]} kanaliga obuna bo'ling!"
+    )
+
+BROADCAST_STATUS_LABELS = {
+    'pending': "⏳ Navbatda",
+    'running': "⏳ Yuborilmoqda",
+    'paused': "⏸ To'xtatilgan",
+    'cancelled': "🛑 Bekor qilingan",
+    'completed': "✅ Yakunlangan"
+}
+
+def format_progress(job):
+    """Broadcast holati matni"""
+    done = job.sent + job.failed + job.skipped
+    return (
+        f"{BROADCAST_STATUS_LABELS.get(job.status, job.status)} - broadcast #{job.id}: "
+        f"{done}/{job.total}\n"
+        f"✅ Muvaffaqiyatli: {job.sent}\n"
+        f"❌ Xatolik: {job.failed}\n"
+        f"📤 Obuna emas: {job.skipped}"
+    )
+
+async def _deliver(bot, user_id, text):
+    """Bitta foydalanuvchiga yuborish: (status, xatolik, yetkazish holati)
+    
+    status - 'sent', 'failed' yoki 'skipped'; yetkazish holati None bo'lsa o'zgarmaydi.
+    """
+    # Obuna bo'lmaganlarga yubormaymiz
+    if not await check_channel_subscription(bot, user_id):
+        return 'skipped', None, None
+    
+    error = None
+    for attempt in range(config.BROADCAST_MAX_ATTEMPTS):
+        await send_bucket.acquire()
+        try:
+            await bot.send_message(
+                chat_id=user_id, text=text, rate_limit_args={'lane': LANE_BROADCAST}
+            )
+            return 'sent', None, 'ok'
+        except RetryAfter as e:
+            # Limitdan oshdik - hamma kutadi, shu foydalanuvchi qayta uriniladi
+            logger.warning(f"⚠️ Broadcast: RetryAfter {e.retry_after} s")
+            send_bucket.pause(e.retry_after)
+            error = e
+        except (Forbidden, BadRequest) as e:
+            # Bloklagan yoki mavjud emas - qayta urinish foydasiz
+            return 'failed', str(e), delivery_state_for(e)
+        except (TimedOut, NetworkError) as e:
+            error = e
+            await asyncio.sleep(2 ** attempt)
+        except Exception as e:
+            logger.error(f"Xabar yuborishda xatolik {user_id}: {e}")
+            return 'failed', str(e), None
+    
+    return 'failed', str(error), None
+
+async def _update_progress(bot, job):
+    """Admin chatidagi progress xabarini yangilash"""
+    if not job.chat_id or not job.progress_message_id:
+        return
+    try:
+        await bot.edit_message_text(
+            format_progress(job), chat_id=job.chat_id, message_id=job.progress_message_id,
+            rate_limit_args={'lane': LANE_BROADCAST}
+        )
+    except Exception as e:
+        logger.debug(f"Progress xabarini yangilab bo'lmadi: {e}")
+
+async def _send_summary(bot, job):
+    """Progress xabarini o'chirib, admin chatiga yakuniy natijani yuborish"""
+    if not job.chat_id:
+        return
+    title = "✅ Broadcast #{} yakunlandi!" if job.status == 'completed' else "🛑 Broadcast #{} bekor qilindi!"
+    try:
+        if job.progress_message_id:
+            await bot.delete_message(chat_id=job.chat_id, message_id=job.progress_message_id)
+        await bot.send_message(
+            chat_id=job.chat_id,
+            text=f"{title.format(job.id)}\n\n"
+                 f"📊 Statistikalar:\n"
+                 f"• 👥 Jami foydalanuvchilar: {job.total}\n"
+                 f"• ✅ Muvaffaqiyatli: {job.sent}\n"
+                 f"• ❌ Xatolik: {job.failed}\n"
+                 f"• 📤 Yuborilmagan (obuna emas): {job.skipped}"
+        )
+    except Exception as e:
+        logger.error(f"Broadcast natijasini yuborishda xatolik: {e}")
+
+async def _finish_job(bot, job):
+    """Yuborish to'xtagandan keyin: pauza - progress yangilanadi, aks holda yakuniy natija"""
+    if job.status == 'paused':
+        logger.info(f"⏸ Broadcast #{job.id} pauza qilindi")
+        await _update_progress(bot, job)
+        return job
+    
+    logger.info(
+        f"✅ Broadcast #{job.id} tugadi ({job.status}): {job.sent} yuborildi, "
+        f"{job.failed} xatolik, {job.skipped} obuna emas"
+    )
+    await _send_summary(bot, job)
+    return job
+
+async def run_broadcast_job(application, job_id):
+    """Broadcast vazifasini bajarish (yoki to'xtagan joyidan davom ettirish)
+    
+    Qabul qiluvchilar kichik qismlarda olinadi, har bir qism natijasi darhol
+    bazaga yoziladi - jarayon qayta ishga tushsa yuborilganlar takrorlanmaydi.
+    Har bir qismdan oldin holat tekshiriladi: pauza yoki bekor qilish shu
+    yerda kuchga kiradi.
+    """
+    bot = application.bot
+    job = await async_db.get_broadcast_job(job_id)
+    if not job or job.status not in ('pending', 'running'):
+        return job
+    
+    if not await async_db.set_broadcast_job_status(job_id, 'running', ('pending', 'running')):
+        # O'qish va yozish orasida pauza qilingan yoki bekor qilingan - hech narsa yuborilmaydi
+        return await _finish_job(bot, await async_db.get_broadcast_job(job_id))
+    
+    text = format_broadcast_text(job.text)
+    concurrency = asyncio.Semaphore(config.BROADCAST_CONCURRENCY)
+    
+    async def deliver(user_id):
+        async with concurrency:
+            return (user_id, *await _deliver(bot, user_id, text))
+    
+    logger.info(f"📢 Broadcast #{job_id} boshlandi ({job.total} ta qabul qiluvchi)")
+    last_progress = time.monotonic()
+    while True:
+        if _should_stop(application):
+            # Holat 'running' qoladi - keyingi ishga tushishda davom etadi
+            logger.info(f"⏸ Broadcast #{job_id} bot to'xtashi sababli to'xtatildi")
+            return job
+        
+        job = await async_db.get_broadcast_job(job_id)
+        if job.status != 'running':
+            break  # Admin pauza qildi yoki bekor qildi
+        
+        user_ids = await async_db.get_pending_recipients(job_id, config.BROADCAST_BATCH_SIZE)
+        if not user_ids:
+            await async_db.set_broadcast_job_status(job_id, 'completed', ('running',))
+            job = await async_db.get_broadcast_job(job_id)
+            break
+        
+        results = await asyncio.gather(*(deliver(user_id) for user_id in user_ids))
+        await async_db.record_broadcast_results(job_id, results)
+        
+        # Progress vaqt bo'yicha yangilanadi - tez yuborishda ham edit limitiga tushmaydi
+        if time.monotonic() - last_progress >= config.BROADCAST_PROGRESS_INTERVAL:
+            await _update_progress(bot, await async_db.get_broadcast_job(job_id))
+            last_progress = time.monotonic()
+    
+    return await _finish_job(bot, job)
+
+def start_broadcast(application, job_id):
+    """Broadcastni fon vazifasi sifatida ishga tushirish (allaqachon ishlayotgan bo'lsa False)
+    
+    Application ishlab turgan bo'lishi kerak - aks holda vazifa darhol to'xtaydi.
+    """
+    if job_id in _tasks:
+        return False
+    
+    task = application.create_task(run_broadcast_job(application, job_id), name=f"broadcast-{job_id}")
+    _tasks[job_id] = task
+    
+    def on_done(finished):
+        _tasks.pop(job_id, None)
+        if not finished.cancelled() and finished.exception():
+            logger.error(f"❌ Broadcast #{job_id} xatolik bilan to'xtadi: {finished.exception()}")
+    
+    task.add_done_callback(on_done)
+    return True
+
+def is_broadcast_running(job_id):
+    """Broadcast hozir shu jarayonda bajarilayaptimi"""
+    return job_id in _tasks
+
+async def resume_broadcasts(application):
+    """Jarayon qayta ishga tushganda tugallanmagan broadcastlarni davom ettirish"""
+    for job in await async_db.get_unfinished_broadcast_jobs():
+        logger.info(f"🔁 Broadcast #{job.id} davom ettirilmoqda")
+        start_broadcast(application, job.id)
+
+async def stop_broadcasts():
+    """Bot to'xtaganda: joriy qismlar tugashini kutish (holat saqlanadi, keyin davom etadi)
+    
+    Vazifalar bekor qilinmaydi - yuborilgan qism natijalari yozib olinadi va
+    keyingi ishga tushishda shu foydalanuvchilarga qayta yuborilmaydi.
+    """
+    global _shutting_down
+    _shutting_down = True
+    
+    tasks = list(_tasks.values())
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
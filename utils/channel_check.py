@@ -1,43 +1,294 @@
+import asyncio
 import logging
+import time
+from collections import OrderedDict
 from telegram import ChatMember
+from telegram.error import BadRequest, RetryAfter
 import config
+from utils import async_db
 
 logger = logging.getLogger(__name__)
 
+class SubscriptionCache:
+    """Obuna natijalari keshi: user_id -> (amal qilish muddati, natija)
+    
+    Obuna bo'lganlar uzoqroq, obuna bo'lmaganlar qisqa muddat saqlanadi
+    (obuna bo'lgach tez o'tkazib yuborish uchun). Hajm cheklangan - eng
+    uzoq ishlatilmagan yozuv o'chiriladi (LRU).
+    """
+    
+    def __init__(self, max_size, positive_ttl, negative_ttl):
+        self.max_size = max_size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, user_id):
+        """Keshdagi natija (True/False) yoki topilmasa/eskirgan bo'lsa None"""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, user_id, is_subscribed, ttl=None):
+        """Natijani saqlash (ttl berilmasa - natijaga qarab)"""
+        if ttl is None:
+            ttl = self.positive_ttl if is_subscribed else self.negative_ttl
+        self._entries[user_id] = (time.monotonic() + ttl, is_subscribed)
+        self._entries.move_to_end(user_id)
+        
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, user_id=None):
+        """Bitta foydalanuvchi (yoki user_id berilmasa - butun kesh) yozuvini o'chirish"""
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+    
+    def stats(self):
+        """Kesh ko'rsatkichlari"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+class CircuitBreaker:
+    """Bitta kanal uchun Bot API holati
+    
+    closed - so'rovlar odatdagidek; ketma-ket xatoliklar chegaradan oshsa
+    open - so'rovlar yuborilmaydi, kutish har safar ikki barobar oshadi;
+    muddat tugagach half_open - bitta sinov so'rovi, muvaffaqiyatli bo'lsa closed.
+    """
+    
+    def __init__(self, name, failure_threshold, base_delay, max_delay):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = 'closed'
+        self.failures = 0
+        self.open_count = 0
+        self.open_until = 0.0
+        self.last_error = None
+    
+    def allow_request(self):
+        """So'rov yuborish mumkinmi (half_open da faqat bitta sinov)"""
+        if self.state == 'closed':
+            return True
+        now = time.monotonic()
+        if now >= self.open_until:
+            # Sinov javobsiz qolsa (bekor qilingan) - timeoutdan keyin yangi sinov
+            self.state = 'half_open'
+            self.open_until = now + config.CHANNEL_CHECK_TIMEOUT
+            return True
+        return False
+    
+    def record_success(self):
+        """Muvaffaqiyatli javob - holat tiklanadi"""
+        if self.state != 'closed':
+            logger.info(f"✅ Kanal @{self.name} API holati tiklandi")
+        self.state = 'closed'
+        self.failures = 0
+        self.open_count = 0
+        self.last_error = None
+    
+    def record_failure(self, error, retry_after=None):
+        """Xatolik - chegaradan oshsa (yoki sinov muvaffaqiyatsiz bo'lsa) ochiladi"""
+        self.failures += 1
+        self.last_error = str(error)
+        
+        if self.state == 'half_open' or self.failures >= self.failure_threshold or retry_after:
+            delay = min(self.max_delay, self.base_delay * 2 ** self.open_count)
+            delay = max(delay, retry_after or 0)
+            self.state = 'open'
+            self.open_until = time.monotonic() + delay
+            self.open_count += 1
+            logger.warning(f"⚠️ Kanal @{self.name} API tekshiruvi {delay:.0f} s ga to'xtatildi: {error}")
+    
+    def snapshot(self):
+        """Holat ko'rsatkichlari (health endpoint uchun)"""
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'retry_in': max(0.0, round(self.open_until - time.monotonic(), 1)) if self.state == 'open' else 0.0,
+            'last_error': self.last_error
+        }
+
+subscription_cache = SubscriptionCache(
+    config.SUBSCRIPTION_CACHE_SIZE,
+    config.SUBSCRIPTION_CACHE_TTL,
+    config.SUBSCRIPTION_CACHE_NEGATIVE_TTL
+)
+
+# Hozir bajarilayotgan tekshiruvlar: user_id -> asyncio.Task
+_inflight = {}
+
+# Har bir kanal uchun alohida breaker
+_breakers = {
+    channel.lower(): CircuitBreaker(
+        channel,
+        config.CHANNEL_BREAKER_FAILURE_THRESHOLD,
+        config.CHANNEL_BREAKER_BASE_DELAY,
+        config.CHANNEL_BREAKER_MAX_DELAY
+    )
+    for channel in config.CHANNEL_USERNAMES
+}
+
+def invalidate_subscription(user_id=None):
+    """Foydalanuvchi obuna natijasini keshdan o'chirish (keyingi tekshiruv API dan)"""
+    subscription_cache.invalidate(user_id)
+
+def get_subscription_cache_stats():
+    """Obuna keshi statistikasi (hits, misses, hit_rate, ...)"""
+    return subscription_cache.stats()
+
+def get_breaker_states():
+    """Kanallar bo'yicha breaker holatlari: {channel: {...}}"""
+    return {channel: breaker.snapshot() for channel, breaker in _breakers.items()}
+
+def is_member_status(status):
+    """ChatMember statusi kanalga obuna ekanligini bildiradimi"""
+    return status in [
+        ChatMember.MEMBER,
+        ChatMember.ADMINISTRATOR,
+        ChatMember.OWNER
+    ]
+
+async def _fetch_channel_status(bot, channel, user_id):
+    """Bitta kanal uchun Bot API dan status olish (xatolikda yoki breaker ochiq bo'lsa None)"""
+    breaker = _breakers[channel.lower()]
+    if not breaker.allow_request():
+        return None
+    
+    try:
+        chat_member = await asyncio.wait_for(
+            bot.get_chat_member(chat_id=f"@{channel}", user_id=user_id),
+            timeout=config.CHANNEL_CHECK_TIMEOUT
+        )
+    except RetryAfter as e:
+        breaker.record_failure(e, retry_after=e.retry_after)
+        return None
+    except BadRequest as e:
+        # Foydalanuvchiga tegishli xatolik - kanal API si ishlayapti
+        if "user not found" in str(e).lower() or "participant_id_invalid" in str(e).lower():
+            breaker.record_success()
+            return ChatMember.LEFT
+        logger.error(f"Error checking channel {channel} for user {user_id}: {e}")
+        breaker.record_failure(e)
+        return None
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout checking channel {channel} for user {user_id}")
+        breaker.record_failure("timeout")
+        return None
+    except Exception as e:
+        logger.error(f"Error checking channel {channel} for user {user_id}: {e}")
+        breaker.record_failure(e)
+        return None
+    
+    breaker.record_success()
+    return chat_member.status
+
+async def _degraded_statuses(user_id, channels):
+    """API ishlamayotgan kanallar uchun config.SUBSCRIPTION_DEGRADED_POLICY bo'yicha status
+    
+    last_known - jadvaldagi oxirgi ma'lum status (eskirgan bo'lsa ham), noma'lum bo'lsa ruxsat;
+    allow - obuna deb hisoblanadi; deny - obuna emas deb hisoblanadi.
+    """
+    policy = config.SUBSCRIPTION_DEGRADED_POLICY
+    if policy == 'deny':
+        return {channel.lower(): ChatMember.LEFT for channel in channels}
+    
+    statuses = {channel.lower(): ChatMember.MEMBER for channel in channels}
+    if policy == 'last_known':
+        known = await async_db.get_channel_statuses(user_id, None)
+        statuses.update((channel, status) for channel, status in known.items() if channel in statuses)
+    return statuses
+
+async def _load_subscription(bot, user_id):
+    """
+    BARCHA kanallarni tekshirish va natijani keshlash.
+    Avval a'zolar jadvali (chat_member yangilanishlari), faqat noma'lum
+    kanallar Bot API orqali parallel tekshiriladi. API ishlamasa -
+    degraded siyosat bo'yicha qaror qilinadi va natija qisqa muddat keshlanadi.
+    """
+    statuses = await async_db.get_channel_statuses(user_id, config.CHANNEL_MEMBERS_MAX_AGE)
+    unknown = [
+        channel for channel in config.CHANNEL_USERNAMES
+        if channel.lower() not in statuses
+    ]
+    
+    degraded = []
+    if unknown:
+        # Kanallar bir vaqtda tekshiriladi - kutish eng sekin kanalga teng
+        fetched = await asyncio.gather(
+            *(_fetch_channel_status(bot, channel, user_id) for channel in unknown)
+        )
+        found = [
+            (channel, user_id, status)
+            for channel, status in zip(unknown, fetched)
+            if status is not None
+        ]
+        if found:
+            await async_db.save_channel_statuses(found)
+        statuses.update((channel.lower(), status) for channel, _, status in found)
+        degraded = [channel for channel, status in zip(unknown, fetched) if status is None]
+    
+    if degraded:
+        statuses.update(await _degraded_statuses(user_id, degraded))
+    
+    is_subscribed = True
+    for channel in config.CHANNEL_USERNAMES:
+        status = statuses[channel.lower()]
+        if not is_member_status(status):
+            logger.info(f"User {user_id} {channel} kanaliga obuna emas. Status: {status}")
+            is_subscribed = False  # Kamida bitta kanalga obuna emas
+            break
+    
+    # Taxminiy natija uzoq saqlanmaydi - API tiklangach qayta tekshiriladi
+    ttl = config.SUBSCRIPTION_CACHE_NEGATIVE_TTL if degraded else None
+    subscription_cache.set(user_id, is_subscribed, ttl)
+    return is_subscribed
+
 async def check_channel_subscription(bot, user_id):
     """
     Foydalanuvchi BARCHA kanallarga obuna bo'lganligini tekshiradi
+    (natija keshlanadi - har bir xabarda Bot API ga murojaat qilinmaydi)
     """
     try:
         # Admin uchun tekshiruv o'tkazilmaydi
         if user_id == config.ADMIN_ID:
             return True
-            
-        # HAR BIR KANALNI TEKSHIRAMIZ
-        for channel in config.CHANNEL_USERNAMES:
-            try:
-                chat_member = await bot.get_chat_member(
-                    chat_id=f"@{channel}",
-                    user_id=user_id
-                )
-                
-                if chat_member.status in [
-                    ChatMember.MEMBER,
-                    ChatMember.ADMINISTRATOR,
-                    ChatMember.OWNER
-                ]:
-                    continue  # Bu kanalga obuna bo'lgan, keyingisiga o't
-                else:
-                    logger.info(f"User {user_id} {channel} kanaliga obuna emas. Status: {chat_member.status}")
-                    return False  # Obuna emas
-                    
-            except Exception as e:
-                logger.error(f"Error checking channel {channel} for user {user_id}: {e}")
-                return False  # Xatolik bo'lsa ham obuna deb hisoblamaymiz
         
-        # Agar barcha kanallarga obuna bo'lsa
-        return True
+        cached = subscription_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
+        # Bir foydalanuvchi uchun bir vaqtda bitta tekshiruv - qolganlar uni kutadi
+        task = _inflight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(_load_subscription(bot, user_id))
+            _inflight[user_id] = task
+            task.add_done_callback(lambda _: _inflight.pop(user_id, None))
+        
+        # shield - bitta kutuvchi bekor qilinsa, umumiy tekshiruv to'xtamaydi
+        return await asyncio.shield(task)
         
     except Exception as e:
         logger.error(f"Error checking channel subscription for user {user_id}: {e}")
-        return False
\ No newline at end of file
+        return False
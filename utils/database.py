@@ -1,13 +1,600 @@
+import re
 import sqlite3
 import logging
-from datetime import datetime
+import threading
+import time
 import config
+from utils.time_utils import now_timestamp, local_days, utc_offset_seconds
+from utils.models import (
+    UserRow, RequestRow, RequestListRow, UserRequestRow, RecentRequestRow,
+    ReplyRow, AdminRow, RequestMatchRow, BroadcastJobRow, row_factory
+)
 
 logger = logging.getLogger(__name__)
 
+# Har bir thread uchun bitta doimiy ulanish
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+# Holatlar soni keshi: (amal qilish muddati, natija)
+_status_counts_cache = None
+_status_counts_lock = threading.Lock()
+
+# Faollik buferi: user_id -> oxirgi faollik vaqti (write-behind)
+_activity_buffer = {}
+_activity_lock = threading.Lock()
+
+def _open_connection():
+    """Yangi ulanish ochish va PRAGMA sozlamalarini qo'llash"""
+    conn = sqlite3.connect(
+        config.DATABASE_NAME,
+        timeout=config.DB_BUSY_TIMEOUT,
+        check_same_thread=False,
+        cached_statements=config.DB_STATEMENT_CACHE_SIZE
+    )
+    # WAL - o'quvchilar yozuvchini bloklamaydi, commit da fsync kamroq
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{config.DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={config.DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
 def get_connection():
-    """DB ulanishini olish"""
-    return sqlite3.connect(config.DATABASE_NAME, check_same_thread=False)
+    """DB ulanishini olish (thread uchun doimiy ulanish qayta ishlatiladi)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "generation", None) != _generation:
+        conn = _open_connection()
+        with _connections_lock:
+            _connections.append(conn)
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+def close_connections():
+    """Barcha ochiq ulanishlarni yopish (bot to'xtaganda)"""
+    global _generation
+
+    with _connections_lock:
+        connections = list(_connections)
+        _connections.clear()
+        _generation += 1
+
+    for conn in connections:
+        try:
+            conn.close()
+        except Exception as e:
+            logger.error(f"Ulanishni yopishda xatolik: {e}")
+
+    logger.info("✅ Ma'lumotlar bazasi ulanishlari yopildi")
+
+def _enable_incremental_vacuum(conn):
+    """auto_vacuum=INCREMENTAL yoqish (mavjud bazada faqat VACUUM orqali o'zgaradi)"""
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+# Ro'yxatlarda ko'rsatiladigan xabar qismi (to'liq matn faqat tafsilotlarda olinadi)
+PREVIEW_LENGTH = 100
+REPLY_PREVIEW_LENGTH = 150
+
+# Joriy vaqt epoch soniyalarda (SQL ifodasi - ustun standart qiymatlari uchun)
+NOW_EPOCH = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+# Epoch ustundan mahalliy kun (YYYY-MM-DD) uchun DATE() siljishi - triggerlarga yoziladi.
+# Asia/Tashkent da yozgi vaqt yo'q; siljish o'zgarsa (TIMEZONE almashtirilsa) init_db
+# triggerlar va kunlik hisoblagichlarni qayta quradi (sync_local_day_counters)
+LOCAL_DAY_MODIFIER = f"'{utc_offset_seconds():+d} seconds'"
+
+# Yetkazish mumkin bo'lganlar: holati 'ok' yoki qayta tekshirish vaqti kelgan
+DELIVERABLE_CONDITION = "(delivery_state = 'ok' OR delivery_checked_at < ?)"
+USER_COLUMNS = "u.id, u.user_id, u.username, u.first_name, u.last_name, u.joined_date, u.last_active"
+REQUEST_LIST_COLUMNS = (
+    f"r.id, r.user_id, substr(r.message, 1, {PREVIEW_LENGTH}), r.status, r.created_at, "
+    "u.username, u.first_name"
+)
+
+# Sxema migratsiyalari: (versiya, tavsif, SQL yoki funksiya)
+# Yangi migratsiya faqat ro'yxat oxiriga qo'shiladi, qo'llanganlari o'zgartirilmaydi
+def _local_day_counters_sql(modifier):
+    """Kunlik hisoblagichlarni qayta hisoblash va ularni yurituvchi triggerlar (modifier - DATE() siljishi)"""
+    return f'''
+    DELETE FROM stats_counters WHERE metric IN ('requests', 'users') AND bucket <> 'all';
+    INSERT INTO stats_counters (metric, bucket, value)
+    SELECT 'requests', DATE(created_at, 'unixepoch', {modifier}), COUNT(*) FROM requests
+    WHERE created_at IS NOT NULL GROUP BY 2;
+    INSERT INTO stats_counters (metric, bucket, value)
+    SELECT 'users', DATE(joined_date, 'unixepoch', {modifier}), COUNT(*) FROM users
+    WHERE joined_date IS NOT NULL GROUP BY 2;
+
+    DROP TRIGGER IF EXISTS trg_requests_stats_insert;
+    CREATE TRIGGER trg_requests_stats_insert AFTER INSERT ON requests
+    BEGIN
+        INSERT INTO stats_counters (metric, bucket, value) VALUES ('requests', 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_counters (metric, bucket, value)
+        VALUES ('requests', DATE(COALESCE(NEW.created_at, {NOW_EPOCH}), 'unixepoch', {modifier}), 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_counters (metric, bucket, value)
+        VALUES ('status:' || COALESCE(NEW.status, ''), 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+    END;
+
+    DROP TRIGGER IF EXISTS trg_requests_stats_delete;
+    CREATE TRIGGER trg_requests_stats_delete AFTER DELETE ON requests
+    BEGIN
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'requests'
+        AND bucket IN ('all', DATE(OLD.created_at, 'unixepoch', {modifier}));
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'status:' || COALESCE(OLD.status, '') AND bucket = 'all';
+    END;
+
+    DROP TRIGGER IF EXISTS trg_users_stats_insert;
+    CREATE TRIGGER trg_users_stats_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO stats_counters (metric, bucket, value) VALUES ('users', 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_counters (metric, bucket, value)
+        VALUES ('users', DATE(COALESCE(NEW.joined_date, {NOW_EPOCH}), 'unixepoch', {modifier}), 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+    END;
+
+    DROP TRIGGER IF EXISTS trg_users_stats_delete;
+    CREATE TRIGGER trg_users_stats_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'users'
+        AND bucket IN ('all', DATE(OLD.joined_date, 'unixepoch', {modifier}));
+    END;
+    '''
+
+MIGRATIONS = [
+    (1, "So'rovlar, javoblar va foydalanuvchilar uchun indekslar", '''
+    CREATE INDEX IF NOT EXISTS idx_requests_status_created ON requests (status, created_at);
+    CREATE INDEX IF NOT EXISTS idx_requests_user_created ON requests (user_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_requests_created ON requests (created_at);
+    CREATE INDEX IF NOT EXISTS idx_replies_request ON replies (request_id, created_at);
+    '''),
+    (2, "Statistika hisoblagichlari jadvali va triggerlar", '''
+    -- bucket: 'all' - umumiy qiymat, 'YYYY-MM-DD' - kunlik qiymat
+    CREATE TABLE IF NOT EXISTS stats_counters (
+        metric TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (metric, bucket)
+    ) WITHOUT ROWID;
+    
+    INSERT INTO stats_counters (metric, bucket, value)
+    SELECT 'requests', 'all', COUNT(*) FROM requests;
+    INSERT INTO stats_counters (metric, bucket, value)
+    SELECT 'requests', DATE(created_at), COUNT(*) FROM requests
+    WHERE created_at IS NOT NULL GROUP BY DATE(created_at);
+    INSERT INTO stats_counters (metric, bucket, value)
+    SELECT 'status:' || status, 'all', COUNT(*) FROM requests
+    WHERE status IS NOT NULL GROUP BY status;
+    INSERT INTO stats_counters (metric, bucket, value)
+    SELECT 'users', 'all', COUNT(*) FROM users;
+    INSERT INTO stats_counters (metric, bucket, value)
+    SELECT 'users', DATE(joined_date), COUNT(*) FROM users
+    WHERE joined_date IS NOT NULL GROUP BY DATE(joined_date);
+    
+    CREATE TRIGGER IF NOT EXISTS trg_requests_stats_insert AFTER INSERT ON requests
+    BEGIN
+        INSERT INTO stats_counters (metric, bucket, value) VALUES ('requests', 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_counters (metric, bucket, value)
+        VALUES ('requests', COALESCE(DATE(NEW.created_at), DATE('now')), 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_counters (metric, bucket, value)
+        VALUES ('status:' || COALESCE(NEW.status, ''), 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_requests_stats_status AFTER UPDATE OF status ON requests
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'status:' || COALESCE(OLD.status, '') AND bucket = 'all';
+        INSERT INTO stats_counters (metric, bucket, value)
+        VALUES ('status:' || COALESCE(NEW.status, ''), 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_requests_stats_delete AFTER DELETE ON requests
+    BEGIN
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'requests' AND bucket IN ('all', DATE(OLD.created_at));
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'status:' || COALESCE(OLD.status, '') AND bucket = 'all';
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_users_stats_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO stats_counters (metric, bucket, value) VALUES ('users', 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_counters (metric, bucket, value)
+        VALUES ('users', COALESCE(DATE(NEW.joined_date), DATE('now')), 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'users' AND bucket IN ('all', DATE(OLD.joined_date));
+    END;
+    '''),
+    (3, "Foydalanuvchilar, so'rovlar va javoblar uchun FTS5 qidiruv", '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        username, first_name, last_name,
+        content='users', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS requests_fts USING fts5(
+        message,
+        content='requests', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS replies_fts USING fts5(
+        reply_text,
+        content='replies', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    
+    INSERT INTO users_fts (users_fts) VALUES ('rebuild');
+    INSERT INTO requests_fts (requests_fts) VALUES ('rebuild');
+    INSERT INTO replies_fts (replies_fts) VALUES ('rebuild');
+    
+    CREATE TRIGGER IF NOT EXISTS trg_users_fts_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO users_fts (rowid, username, first_name, last_name)
+        VALUES (NEW.id, NEW.username, NEW.first_name, NEW.last_name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_users_fts_delete AFTER DELETE ON users
+    BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, first_name, last_name)
+        VALUES ('delete', OLD.id, OLD.username, OLD.first_name, OLD.last_name);
+    END;
+    -- last_active yangilanishi FTS ga tegmaydi
+    CREATE TRIGGER IF NOT EXISTS trg_users_fts_update
+    AFTER UPDATE OF username, first_name, last_name ON users
+    BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, first_name, last_name)
+        VALUES ('delete', OLD.id, OLD.username, OLD.first_name, OLD.last_name);
+        INSERT INTO users_fts (rowid, username, first_name, last_name)
+        VALUES (NEW.id, NEW.username, NEW.first_name, NEW.last_name);
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_requests_fts_insert AFTER INSERT ON requests
+    BEGIN
+        INSERT INTO requests_fts (rowid, message) VALUES (NEW.id, NEW.message);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_requests_fts_delete AFTER DELETE ON requests
+    BEGIN
+        INSERT INTO requests_fts (requests_fts, rowid, message) VALUES ('delete', OLD.id, OLD.message);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_requests_fts_update AFTER UPDATE OF message ON requests
+    BEGIN
+        INSERT INTO requests_fts (requests_fts, rowid, message) VALUES ('delete', OLD.id, OLD.message);
+        INSERT INTO requests_fts (rowid, message) VALUES (NEW.id, NEW.message);
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_replies_fts_insert AFTER INSERT ON replies
+    BEGIN
+        INSERT INTO replies_fts (rowid, reply_text) VALUES (NEW.id, NEW.reply_text);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_replies_fts_delete AFTER DELETE ON replies
+    BEGIN
+        INSERT INTO replies_fts (replies_fts, rowid, reply_text) VALUES ('delete', OLD.id, OLD.reply_text);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_replies_fts_update AFTER UPDATE OF reply_text ON replies
+    BEGIN
+        INSERT INTO replies_fts (replies_fts, rowid, reply_text) VALUES ('delete', OLD.id, OLD.reply_text);
+        INSERT INTO replies_fts (rowid, reply_text) VALUES (NEW.id, NEW.reply_text);
+    END;
+    '''),
+    (4, "Foydalanuvchi so'rovlarini holat bo'yicha sanash uchun indeks", '''
+    CREATE INDEX IF NOT EXISTS idx_requests_user_status ON requests (user_id, status);
+    '''),
+    (5, "Arxivlangan so'rovlar ko'rsatkichi", '''
+    CREATE TABLE IF NOT EXISTS archived_requests (
+        request_id INTEGER PRIMARY KEY,
+        archive_file TEXT NOT NULL,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    '''),
+    (6, "Bo'shagan sahifalarni qaytarish uchun incremental auto_vacuum", _enable_incremental_vacuum),
+    (7, "Vaqt ustunlarini butun son (epoch soniya) ko'rinishiga o'tkazish", f'''
+    -- SQLite ustun turini o'zgartira olmaydi: jadvallar qayta quriladi, id lar saqlanadi.
+    -- Eski qiymatlar UTC matn (CURRENT_TIMESTAMP) - strftime('%s') ularni epoch ga o'giradi.
+    CREATE TEMP TABLE _old_sequence AS SELECT name, seq FROM sqlite_sequence;
+
+    CREATE TABLE users_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER UNIQUE NOT NULL,
+        username TEXT,
+        first_name TEXT,
+        last_name TEXT,
+        joined_date INTEGER DEFAULT ({NOW_EPOCH}),
+        last_active INTEGER DEFAULT ({NOW_EPOCH})
+    );
+    INSERT INTO users_new
+    SELECT id, user_id, username, first_name, last_name,
+           CAST(strftime('%s', joined_date) AS INTEGER),
+           CAST(strftime('%s', last_active) AS INTEGER)
+    FROM users;
+    DROP TABLE users;
+    ALTER TABLE users_new RENAME TO users;
+
+    CREATE TABLE requests_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        status TEXT DEFAULT 'pending',
+        admin_id INTEGER,
+        created_at INTEGER DEFAULT ({NOW_EPOCH}),
+        updated_at INTEGER DEFAULT ({NOW_EPOCH}),
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    );
+    INSERT INTO requests_new
+    SELECT id, user_id, message, status, admin_id,
+           CAST(strftime('%s', created_at) AS INTEGER),
+           CAST(strftime('%s', updated_at) AS INTEGER)
+    FROM requests;
+    DROP TABLE requests;
+    ALTER TABLE requests_new RENAME TO requests;
+
+    CREATE TABLE replies_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id INTEGER NOT NULL,
+        admin_id INTEGER NOT NULL,
+        reply_text TEXT NOT NULL,
+        created_at INTEGER DEFAULT ({NOW_EPOCH}),
+        FOREIGN KEY (request_id) REFERENCES requests (id),
+        FOREIGN KEY (admin_id) REFERENCES users (user_id)
+    );
+    INSERT INTO replies_new
+    SELECT id, request_id, admin_id, reply_text, CAST(strftime('%s', created_at) AS INTEGER)
+    FROM replies;
+    DROP TABLE replies;
+    ALTER TABLE replies_new RENAME TO replies;
+
+    CREATE TABLE admins_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER UNIQUE NOT NULL,
+        added_at INTEGER DEFAULT ({NOW_EPOCH}),
+        added_by INTEGER,
+        is_active INTEGER DEFAULT 1,
+        FOREIGN KEY (added_by) REFERENCES users (user_id)
+    );
+    INSERT INTO admins_new
+    SELECT id, user_id, CAST(strftime('%s', added_at) AS INTEGER), added_by, is_active
+    FROM admins;
+    DROP TABLE admins;
+    ALTER TABLE admins_new RENAME TO admins;
+
+    CREATE TABLE archived_requests_new (
+        request_id INTEGER PRIMARY KEY,
+        archive_file TEXT NOT NULL,
+        archived_at INTEGER DEFAULT ({NOW_EPOCH})
+    );
+    INSERT INTO archived_requests_new
+    SELECT request_id, archive_file, CAST(strftime('%s', archived_at) AS INTEGER)
+    FROM archived_requests;
+    DROP TABLE archived_requests;
+    ALTER TABLE archived_requests_new RENAME TO archived_requests;
+
+    -- AUTOINCREMENT hisoblagichlari: o'chirilgan (arxivlangan) id lar qayta berilmasin
+    INSERT INTO sqlite_sequence (name, seq)
+    SELECT name, seq FROM _old_sequence
+    WHERE name NOT IN (SELECT name FROM sqlite_sequence);
+    UPDATE sqlite_sequence
+    SET seq = MAX(seq, (SELECT o.seq FROM _old_sequence o WHERE o.name = sqlite_sequence.name))
+    WHERE name IN (SELECT name FROM _old_sequence);
+    DROP TABLE _old_sequence;
+
+    CREATE INDEX idx_users_joined ON users (joined_date);
+    CREATE INDEX idx_requests_status_created ON requests (status, created_at);
+    CREATE INDEX idx_requests_user_created ON requests (user_id, created_at);
+    CREATE INDEX idx_requests_created ON requests (created_at);
+    CREATE INDEX idx_requests_user_status ON requests (user_id, status);
+    CREATE INDEX idx_replies_request ON replies (request_id, created_at);
+
+    -- Kunlik hisoblagichlar UTC kun bo'yicha edi - mahalliy kun bo'yicha
+    -- 12-migratsiyada qayta quriladi
+    DELETE FROM stats_counters WHERE bucket <> 'all';
+
+    CREATE TRIGGER trg_requests_stats_insert AFTER INSERT ON requests
+    BEGIN
+        INSERT INTO stats_counters (metric, bucket, value) VALUES ('requests', 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_counters (metric, bucket, value)
+        VALUES ('status:' || COALESCE(NEW.status, ''), 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+    END;
+
+    CREATE TRIGGER trg_requests_stats_status AFTER UPDATE OF status ON requests
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'status:' || COALESCE(OLD.status, '') AND bucket = 'all';
+        INSERT INTO stats_counters (metric, bucket, value)
+        VALUES ('status:' || COALESCE(NEW.status, ''), 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+    END;
+
+    CREATE TRIGGER trg_requests_stats_delete AFTER DELETE ON requests
+    BEGIN
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'requests' AND bucket = 'all';
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'status:' || COALESCE(OLD.status, '') AND bucket = 'all';
+    END;
+
+    CREATE TRIGGER trg_users_stats_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO stats_counters (metric, bucket, value) VALUES ('users', 'all', 1)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + 1;
+    END;
+
+    CREATE TRIGGER trg_users_stats_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE stats_counters SET value = value - 1
+        WHERE metric = 'users' AND bucket = 'all';
+    END;
+
+    -- FTS jadvallari rowid (id) bo'yicha bog'langan - id lar saqlangani uchun
+    -- indeksni qayta qurish shart emas, faqat triggerlar tiklanadi
+    CREATE TRIGGER trg_users_fts_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO users_fts (rowid, username, first_name, last_name)
+        VALUES (NEW.id, NEW.username, NEW.first_name, NEW.last_name);
+    END;
+    CREATE TRIGGER trg_users_fts_delete AFTER DELETE ON users
+    BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, first_name, last_name)
+        VALUES ('delete', OLD.id, OLD.username, OLD.first_name, OLD.last_name);
+    END;
+    CREATE TRIGGER trg_users_fts_update
+    AFTER UPDATE OF username, first_name, last_name ON users
+    BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, first_name, last_name)
+        VALUES ('delete', OLD.id, OLD.username, OLD.first_name, OLD.last_name);
+        INSERT INTO users_fts (rowid, username, first_name, last_name)
+        VALUES (NEW.id, NEW.username, NEW.first_name, NEW.last_name);
+    END;
+
+    CREATE TRIGGER trg_requests_fts_insert AFTER INSERT ON requests
+    BEGIN
+        INSERT INTO requests_fts (rowid, message) VALUES (NEW.id, NEW.message);
+    END;
+    CREATE TRIGGER trg_requests_fts_delete AFTER DELETE ON requests
+    BEGIN
+        INSERT INTO requests_fts (requests_fts, rowid, message) VALUES ('delete', OLD.id, OLD.message);
+    END;
+    CREATE TRIGGER trg_requests_fts_update AFTER UPDATE OF message ON requests
+    BEGIN
+        INSERT INTO requests_fts (requests_fts, rowid, message) VALUES ('delete', OLD.id, OLD.message);
+        INSERT INTO requests_fts (rowid, message) VALUES (NEW.id, NEW.message);
+    END;
+
+    CREATE TRIGGER trg_replies_fts_insert AFTER INSERT ON replies
+    BEGIN
+        INSERT INTO replies_fts (rowid, reply_text) VALUES (NEW.id, NEW.reply_text);
+    END;
+    CREATE TRIGGER trg_replies_fts_delete AFTER DELETE ON replies
+    BEGIN
+        INSERT INTO replies_fts (replies_fts, rowid, reply_text) VALUES ('delete', OLD.id, OLD.reply_text);
+    END;
+    CREATE TRIGGER trg_replies_fts_update AFTER UPDATE OF reply_text ON replies
+    BEGIN
+        INSERT INTO replies_fts (replies_fts, rowid, reply_text) VALUES ('delete', OLD.id, OLD.reply_text);
+        INSERT INTO replies_fts (rowid, reply_text) VALUES (NEW.id, NEW.reply_text);
+    END;
+    '''),
+    (8, "Kanal a'zolari jadvali (chat_member yangilanishlaridan)", '''
+    -- channel: kichik harfli username (@ siz), status: Telegram ChatMember statusi
+    CREATE TABLE IF NOT EXISTS channel_members (
+        channel TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        updated_at INTEGER NOT NULL,
+        PRIMARY KEY (user_id, channel)
+    ) WITHOUT ROWID;
+    '''),
+    (9, "Broadcast vazifalari va qabul qiluvchilar jadvallari", f'''
+    -- status: pending, running, paused, cancelled, completed
+    CREATE TABLE IF NOT EXISTS broadcast_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        text TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        created_by INTEGER,
+        chat_id INTEGER,
+        progress_message_id INTEGER,
+        total INTEGER NOT NULL DEFAULT 0,
+        sent INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        skipped INTEGER NOT NULL DEFAULT 0,
+        created_at INTEGER DEFAULT ({NOW_EPOCH}),
+        finished_at INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs (status);
+    
+    -- status: pending, sent, failed, skipped (obuna emas)
+    CREATE TABLE IF NOT EXISTS broadcast_recipients (
+        job_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        error TEXT,
+        updated_at INTEGER,
+        PRIMARY KEY (job_id, user_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_pending
+    ON broadcast_recipients (job_id, user_id) WHERE status = 'pending';
+    '''),
+    (10, "Foydalanuvchilarga yetkazish holati (bloklagan / o'chirilgan akkaunt)", '''
+    -- delivery_state: ok, blocked, deactivated, not_found
+    ALTER TABLE users ADD COLUMN delivery_state TEXT NOT NULL DEFAULT 'ok';
+    ALTER TABLE users ADD COLUMN delivery_checked_at INTEGER;
+    CREATE INDEX IF NOT EXISTS idx_users_undeliverable
+    ON users (delivery_checked_at) WHERE delivery_state != 'ok';
+    '''),
+    (11, "Boshqa foydalanuvchi so'roviga o'xshash so'rovlar belgisi", '''
+    ALTER TABLE requests ADD COLUMN duplicate_of INTEGER;
+    '''),
+    (12, "Kunlik statistika hisoblagichlari (mahalliy kun bo'yicha)", _local_day_counters_sql(LOCAL_DAY_MODIFIER)),
+    (13, "Ishlatilmaydigan joined_date indeksini o'chirish", '''
+    DROP INDEX IF EXISTS idx_users_joined;
+    '''),
+]
+
+def get_schema_version(conn):
+    """Joriy sxema versiyasini olish"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn):
+    """Qo'llanmagan migratsiyalarni tartib bilan qo'llash"""
+    current_version = get_schema_version(conn)
+    
+    for version, description, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+        
+        logger.info(f"🔧 Migratsiya v{version}: {description}")
+        try:
+            if callable(migration):
+                # Tranzaksiyadan tashqarida bajariladigan migratsiya (masalan VACUUM)
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            else:
+                # Har bir migratsiya alohida tranzaksiyada - versiya bilan birga yoziladi
+                conn.executescript(f"BEGIN;\n{migration}\nPRAGMA user_version = {version};\nCOMMIT;")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            logger.error(f"❌ Migratsiya v{version} xatosi: {e}")
+            raise
+        current_version = version
+    
+    return current_version
+
+def sync_local_day_counters(conn):
+    """Triggerlardagi kun siljishi joriy TIMEZONE ga mos kelmasa - qayta qurish"""
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_requests_stats_insert'"
+    ).fetchone()
+    if row and LOCAL_DAY_MODIFIER in row[0]:
+        return False
+    
+    logger.info(f"🔧 Kunlik hisoblagichlar {config.TIMEZONE} ({LOCAL_DAY_MODIFIER}) bo'yicha qayta qurilmoqda")
+    try:
+        conn.executescript(f"BEGIN;\n{_local_day_counters_sql(LOCAL_DAY_MODIFIER)}\nCOMMIT;")
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    return True
 
 def init_db():
     """Ma'lumotlar bazasini ishga tushurish"""
@@ -74,188 +661,404 @@ def init_db():
         logger.error(f"Dastlabki admin qo'shishda xatolik: {e}")
     
     conn.commit()
-    conn.close()
-    logger.info("✅ Ma'lumotlar bazasi ishga tushdi")
+    
+    # Sxemani oxirgi versiyaga keltirish
+    schema_version = apply_migrations(conn)
+    sync_local_day_counters(conn)
+    conn.execute("PRAGMA optimize")
+    logger.info(f"✅ Ma'lumotlar bazasi ishga tushdi (sxema v{schema_version})")
 
 def add_user(user_id, username, first_name, last_name):
     """Yangi foydalanuvchi qo'shish"""
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-    INSERT OR REPLACE INTO users (user_id, username, first_name, last_name, last_active)
-    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-    ''', (user_id, username, first_name, last_name))
-    conn.commit()
-    conn.close()
+    with conn:
+        cursor = conn.cursor()
+        # UPSERT - REPLACE qatorni o'chirib qayta qo'shardi (joined_date va hisoblagichlar buzilardi)
+        cursor.execute('''
+        INSERT INTO users (user_id, username, first_name, last_name, last_active)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            username = excluded.username,
+            first_name = excluded.first_name,
+            last_name = excluded.last_name,
+            last_active = excluded.last_active,
+            delivery_state = 'ok'
+        ''', (user_id, username, first_name, last_name, now_timestamp()))
 
-def add_request(user_id, message):
-    """Yangi so'rov qo'shish"""
+def add_request(user_id, message, duplicate_of=None):
+    """Yangi so'rov qo'shish (duplicate_of - o'xshash ochiq so'rov ID si)"""
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-    INSERT INTO requests (user_id, message, status, created_at)
-    VALUES (?, ?, 'pending', CURRENT_TIMESTAMP)
-    ''', (user_id, message))
-    request_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    now = now_timestamp()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT INTO requests (user_id, message, status, created_at, updated_at, duplicate_of)
+        VALUES (?, ?, 'pending', ?, ?, ?)
+        ''', (user_id, message, now, now, duplicate_of))
+        request_id = cursor.lastrowid
+    invalidate_status_counts()
     return request_id
 
+def append_to_request(request_id, user_id, text):
+    """Foydalanuvchining ochiq so'roviga qo'shimcha matn yozish (takroriy so'rov o'rniga)
+
+    So'rov yopilgan yoki boshqa foydalanuvchiniki bo'lsa False qaytaradi.
+    """
+    conn = get_connection()
+    now = now_timestamp()
+    with conn:
+        cursor = conn.execute('''
+        UPDATE requests SET message = message || ?, updated_at = ?
+        WHERE id = ? AND user_id = ? AND status IN ('pending', 'in_progress')
+        ''', (f"\n\n➕ Qo'shimcha: {text}", now, request_id, user_id))
+    return cursor.rowcount > 0
+
 def add_reply(request_id, admin_id, reply_text):
     """Admin javobini qo'shish"""
     conn = get_connection()
-    cursor = conn.cursor()
+    now = now_timestamp()
+    with conn:
+        cursor = conn.cursor()
+        
+        # Javobni saqlash
+        cursor.execute('''
+        INSERT INTO replies (request_id, admin_id, reply_text, created_at)
+        VALUES (?, ?, ?, ?)
+        ''', (request_id, admin_id, reply_text, now))
+        
+        # So'rov statusini yangilash
+        cursor.execute('''
+        UPDATE requests 
+        SET status = 'completed', admin_id = ?, 
+            updated_at = ?
+        WHERE id = ?
+        ''', (admin_id, now, request_id))
+    invalidate_status_counts()
+
+def _read_counters(cursor, keys):
+    """Hisoblagichlarni (metric, bucket) kalitlari bo'yicha o'qish"""
+    metrics = sorted({metric for metric, _ in keys})
+    buckets = sorted({bucket for _, bucket in keys})
+    # Ikkala IN ham PRIMARY KEY bo'yicha qidiriladi - jadval skan qilinmaydi
+    cursor.execute(f'''
+    SELECT metric, bucket, value FROM stats_counters
+    WHERE metric IN ({", ".join("?" * len(metrics))})
+    AND bucket IN ({", ".join("?" * len(buckets))})
+    ''', metrics + buckets)
     
-    # Javobni saqlash
-    cursor.execute('''
-    INSERT INTO replies (request_id, admin_id, reply_text)
-    VALUES (?, ?, ?)
-    ''', (request_id, admin_id, reply_text))
+    counters = {key: 0 for key in keys}
+    for metric, bucket, value in cursor.fetchall():
+        if (metric, bucket) in counters:
+            counters[(metric, bucket)] = value
+    return counters
+
+def invalidate_status_counts():
+    """Holatlar soni keshini tozalash (so'rov qo'shilganda/o'zgarganda)"""
+    global _status_counts_cache
+    with _status_counts_lock:
+        _status_counts_cache = None
+
+def get_status_counts(user_id=None):
+    """So'rovlar sonini holat bo'yicha olish
     
-    # So'rov statusini yangilash
-    cursor.execute('''
-    UPDATE requests 
-    SET status = 'completed', admin_id = ?, 
-        updated_at = CURRENT_TIMESTAMP
-    WHERE id = ?
-    ''', (admin_id, request_id))
+    user_id berilmasa - umumiy hisoblagichlardan (qisqa muddat keshlanadi),
+    berilsa - shu foydalanuvchi so'rovlari GROUP BY orqali sanaladi.
+    """
+    global _status_counts_cache
+    
+    if user_id is None:
+        with _status_counts_lock:
+            if _status_counts_cache and _status_counts_cache[0] > time.monotonic():
+                return dict(_status_counts_cache[1])
     
-    conn.commit()
-    conn.close()
-
-def get_statistics():
-    """Statistika olish"""
     conn = get_connection()
     cursor = conn.cursor()
+    counts = {'pending': 0, 'in_progress': 0, 'completed': 0}
     
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM requests")
-    total_requests = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM requests WHERE status='pending'")
-    pending_requests = cursor.fetchone()[0]
+    if user_id is None:
+        cursor.execute('''
+        SELECT SUBSTR(metric, 8), value FROM stats_counters
+        WHERE metric BETWEEN 'status:' AND 'status;' AND bucket = 'all'
+        ''')
+    else:
+        cursor.execute('''
+        SELECT status, COUNT(*) FROM requests
+        WHERE user_id = ?
+        GROUP BY status
+        ''', (user_id,))
     
-    cursor.execute("SELECT COUNT(*) FROM requests WHERE status='in_progress'")
-    in_progress_requests = cursor.fetchone()[0]
+    for status, count in cursor.fetchall():
+        if status:
+            counts[status] = count
     
-    cursor.execute("SELECT COUNT(*) FROM requests WHERE status='completed'")
-    completed_requests = cursor.fetchone()[0]
+    if user_id is None:
+        with _status_counts_lock:
+            _status_counts_cache = (time.monotonic() + config.STATUS_COUNTS_CACHE_TTL, dict(counts))
     
-    # Bugungi so'rovlar
-    cursor.execute("SELECT COUNT(*) FROM requests WHERE DATE(created_at) = DATE('now')")
-    today_requests = cursor.fetchone()[0]
+    return counts
+
+def get_statistics():
+    """Statistika olish (triggerlar yuritadigan hisoblagichlardan)"""
+    conn = get_connection()
+    cursor = conn.cursor()
     
-    conn.close()
+    # Bugun - config.TIMEZONE bo'yicha mahalliy kun hisoblagichi
+    [today] = local_days()
+    counters = _read_counters(cursor, [('users', 'all'), ('requests', 'all'), ('requests', today)])
+    status_counts = get_status_counts()
     
     return {
-        'total_users': total_users,
-        'total_requests': total_requests,
-        'pending_requests': pending_requests,
-        'in_progress_requests': in_progress_requests,
-        'completed_requests': completed_requests,
-        'today_requests': today_requests
+        'total_users': counters[('users', 'all')],
+        'total_requests': counters[('requests', 'all')],
+        'pending_requests': status_counts['pending'],
+        'in_progress_requests': status_counts['in_progress'],
+        'completed_requests': status_counts['completed'],
+        'today_requests': counters[('requests', today)]
     }
 
-def search_user(query):
-    """Foydalanuvchini qidirish"""
+def _fts_query(text):
+    """Foydalanuvchi matnidan xavfsiz FTS5 prefiks so'rovini yasash"""
+    tokens = re.findall(r"\w+", text.lower())[:8]
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def search_user(query, limit=50):
+    """Foydalanuvchini qidirish (ID bo'yicha aniq, ism/username bo'yicha FTS5)"""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(UserRow)
+    results = []
     
-    cursor.execute('''
-    SELECT * FROM users 
-    WHERE user_id LIKE ? OR username LIKE ? OR first_name LIKE ? OR last_name LIKE ?
-    LIMIT 50
-    ''', (f"%{query}%", f"%{query}%", f"%{query}%", f"%{query}%"))
+    # Raqam bo'lsa - avval user_id bo'yicha aniq moslik
+    if query.strip().isdigit():
+        cursor.execute(f"SELECT {USER_COLUMNS} FROM users u WHERE u.user_id = ?", (int(query.strip()),))
+        results.extend(cursor.fetchall())
     
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    match = _fts_query(query)
+    if match:
+        cursor.execute(f'''
+        SELECT {USER_COLUMNS} FROM users_fts f
+        JOIN users u ON u.id = f.rowid
+        WHERE users_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+        ''', (match, limit))
+        
+        found_ids = {row.id for row in results}
+        results.extend(row for row in cursor.fetchall() if row.id not in found_ids)
+    
+    return results[:limit]
 
-def get_requests_by_status(status):
-    """Status bo'yicha so'rovlarni olish"""
+def search_requests(query, limit=20):
+    """So'rov va javob matnlari bo'yicha qidirish (reyting va parcha bilan)"""
+    match = _fts_query(query)
+    if not match:
+        return []
+    
     conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
-    SELECT r.*, u.username, u.first_name 
+    SELECT r.id, r.status, r.created_at, 'request',
+           snippet(requests_fts, 0, '«', '»', '…', 12), f.rank
+    FROM requests_fts f
+    JOIN requests r ON r.id = f.rowid
+    WHERE requests_fts MATCH ?
+    ORDER BY f.rank
+    LIMIT ?
+    ''', (match, limit))
+    matches = cursor.fetchall()
+    
+    cursor.execute('''
+    SELECT rp.request_id, r.status, r.created_at, 'reply',
+           snippet(replies_fts, 0, '«', '»', '…', 12), f.rank
+    FROM replies_fts f
+    JOIN replies rp ON rp.id = f.rowid
+    LEFT JOIN requests r ON r.id = rp.request_id
+    WHERE replies_fts MATCH ?
+    ORDER BY f.rank
+    LIMIT ?
+    ''', (match, limit))
+    matches.extend(cursor.fetchall())
+    
+    # bm25 - kichikroq qiymat yaxshiroq; har bir so'rov bir marta
+    results = []
+    seen = set()
+    for row in sorted(matches, key=lambda row: row[5]):
+        if row[0] in seen:
+            continue
+        seen.add(row[0])
+        results.append(RequestMatchRow._make(row[:5]))
+    
+    return results[:limit]
+
+def get_requests_page(status=None, cursor=None, direction='next', limit=10):
+    """So'rovlarni sahifalab olish (keyset: created_at, id bo'yicha)
+    
+    cursor - (created_at, id): 'next' undan eskilarini, 'prev' yangilarini qaytaradi.
+    Natija: (qatorlar, oldingi_sahifa_bormi, keyingi_sahifa_bormi)
+    """
+    conn = get_connection()
+    db_cursor = conn.cursor()
+    db_cursor.row_factory = row_factory(RequestListRow)
+    
+    conditions = []
+    params = []
+    if status:
+        conditions.append("r.status = ?")
+        params.append(status)
+    
+    if cursor and direction == 'prev':
+        conditions.append("(r.created_at, r.id) > (?, ?)")
+        order = "ASC"
+    else:
+        if cursor:
+            conditions.append("(r.created_at, r.id) < (?, ?)")
+        order = "DESC"
+    if cursor:
+        params.extend(cursor)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    # limit + 1 - shu yo'nalishda yana sahifa borligini bilish uchun
+    db_cursor.execute(f'''
+    SELECT {REQUEST_LIST_COLUMNS}
     FROM requests r 
     LEFT JOIN users u ON r.user_id = u.user_id 
-    WHERE r.status = ?
-    ORDER BY r.created_at DESC
-    ''', (status,))
+    {where}
+    ORDER BY r.created_at {order}, r.id {order}
+    LIMIT ?
+    ''', params + [limit + 1])
     
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    rows = db_cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    if cursor and direction == 'prev':
+        rows.reverse()
+        return rows, has_more, True
+    
+    return rows, cursor is not None, has_more
 
 def get_request_details(request_id):
     """So'rov tafsilotlarini olish"""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(RequestRow)
     
     cursor.execute('''
-    SELECT r.*, u.username, u.first_name, u.user_id
+    SELECT r.id, r.user_id, r.message, r.status, r.admin_id, r.created_at, r.updated_at,
+           u.username, u.first_name
     FROM requests r 
     LEFT JOIN users u ON r.user_id = u.user_id 
     WHERE r.id = ?
     ''', (request_id,))
     
     result = cursor.fetchone()
-    conn.close()
     return result
 
 def update_request_status(request_id, status, admin_id=None):
     """So'rov statusini yangilash"""
     conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    UPDATE requests 
-    SET status = ?, admin_id = ?, updated_at = CURRENT_TIMESTAMP
-    WHERE id = ?
-    ''', (status, admin_id, request_id))
-    
-    conn.commit()
-    conn.close()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        UPDATE requests 
+        SET status = ?, admin_id = ?, updated_at = ?
+        WHERE id = ?
+        ''', (status, admin_id, now_timestamp(), request_id))
+    invalidate_status_counts()
 
-def get_all_users():
-    """Barcha foydalanuvchilarni olish"""
+def _reprobe_cutoff():
+    """Shu vaqtdan oldin "yetkazib bo'lmaydi" deb belgilanganlar qayta tekshiriladi"""
+    return now_timestamp() - config.DELIVERY_REPROBE_INTERVAL
+
+def get_all_users(include_undeliverable=False):
+    """Barcha foydalanuvchilarni olish (standart: botni bloklaganlarsiz)"""
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute("SELECT user_id FROM users")
+    if include_undeliverable:
+        cursor.execute("SELECT user_id FROM users")
+    else:
+        cursor.execute(
+            f"SELECT user_id FROM users WHERE {DELIVERABLE_CONDITION}", (_reprobe_cutoff(),)
+        )
     users = [row[0] for row in cursor.fetchall()]
     
-    conn.close()
     return users
 
+def _iter_query(query, params=(), row_type=None, chunk_size=None):
+    """So'rov natijasini fetchmany bilan qismlab qaytaruvchi generator
+    
+    Alohida ulanish ishlatiladi - generator to'liq o'qilmaguncha thread ulanishi
+    band bo'lmaydi va boshqa threadda davom ettirish mumkin. Xotirada faqat
+    bitta qism turadi.
+    """
+    chunk_size = chunk_size or config.DB_STREAM_CHUNK_SIZE
+    conn = _open_connection()
+    try:
+        cursor = conn.cursor()
+        if row_type:
+            cursor.row_factory = row_factory(row_type)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def iter_users(chunk_size=None):
+    """Barcha foydalanuvchilarni qismlab o'qish (eksport uchun)"""
+    return _iter_query(
+        f"SELECT {USER_COLUMNS} FROM users u ORDER BY u.id", row_type=UserRow, chunk_size=chunk_size
+    )
+
+def iter_requests_by_status(status=None, chunk_size=None):
+    """So'rovlarni to'liq matni bilan qismlab o'qish (status=None - hammasi)"""
+    query = '''
+    SELECT r.id, r.user_id, r.message, r.status, r.admin_id, r.created_at, r.updated_at,
+           u.username, u.first_name
+    FROM requests r
+    LEFT JOIN users u ON r.user_id = u.user_id
+    '''
+    params = ()
+    if status:
+        query += "WHERE r.status = ?\n"
+        params = (status,)
+    query += "ORDER BY r.created_at DESC, r.id DESC"
+    return _iter_query(query, params, row_type=RequestRow, chunk_size=chunk_size)
+
 def get_user_requests(user_id):
     """Foydalanuvchi so'rovlarini olish"""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(UserRequestRow)
     
-    cursor.execute('''
-    SELECT r.*, u.username, u.first_name 
+    # Oxirgi admin javobi - har bir so'rov uchun indeks bo'yicha bitta qator
+    cursor.execute(f'''
+    SELECT r.id, substr(r.message, 1, {PREVIEW_LENGTH}), r.status, r.created_at,
+           (SELECT substr(rp.reply_text, 1, {REPLY_PREVIEW_LENGTH}) FROM replies rp
+            WHERE rp.request_id = r.id
+            ORDER BY rp.created_at DESC, rp.id DESC LIMIT 1)
     FROM requests r 
-    LEFT JOIN users u ON r.user_id = u.user_id 
     WHERE r.user_id = ? 
     ORDER BY r.created_at DESC
     LIMIT 10
     ''', (user_id,))
     
     results = cursor.fetchall()
-    conn.close()
     return results
 
 def get_all_requests(limit=20):
     """Barcha so'rovlarni olish"""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(RequestListRow)
     
-    cursor.execute('''
-    SELECT r.id, r.status, u.first_name, u.username, r.message, r.created_at
+    cursor.execute(f'''
+    SELECT {REQUEST_LIST_COLUMNS}
     FROM requests r 
     LEFT JOIN users u ON r.user_id = u.user_id 
     ORDER BY r.created_at DESC 
@@ -263,7 +1066,6 @@ def get_all_requests(limit=20):
     ''', (limit,))
     
     results = cursor.fetchall()
-    conn.close()
     return results
 
 def is_group_member_admin(user_id):
@@ -275,33 +1077,36 @@ def is_group_member_admin(user_id):
     cursor.execute("SELECT 1 FROM admins WHERE user_id = ? AND is_active = 1", (user_id,))
     is_admin = cursor.fetchone() is not None
     
-    conn.close()
     return is_admin
 
+def get_active_admin_ids():
+    """Faol guruh adminlarining user_id lari to'plami"""
+    conn = get_connection()
+    cursor = conn.execute("SELECT user_id FROM admins WHERE is_active = 1")
+    return {user_id for (user_id,) in cursor.fetchall()}
+
 def add_group_admin(user_id, added_by=None):
     """Yangi guruh adminini qo'shish"""
     conn = get_connection()
-    cursor = conn.cursor()
     
     try:
-        cursor.execute('''
-        INSERT OR REPLACE INTO admins (user_id, added_by, is_active)
-        VALUES (?, ?, 1)
-        ''', (user_id, added_by or user_id))
-        
-        conn.commit()
+        with conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO admins (user_id, added_by, is_active)
+            VALUES (?, ?, 1)
+            ''', (user_id, added_by or user_id))
         result = True
     except Exception as e:
         logger.error(f"Admin qo'shishda xatolik: {e}")
         result = False
     
-    conn.close()
     return result
 
 def get_group_admins():
     """Guruh adminlarini olish"""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(AdminRow)
     
     cursor.execute('''
     SELECT a.user_id, u.username, u.first_name, a.added_at, a.added_by
@@ -312,21 +1117,17 @@ def get_group_admins():
     ''')
     
     admins = cursor.fetchall()
-    conn.close()
     return admins
 
 def remove_group_admin(user_id):
     """Guruh adminini o'chirish"""
     conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    UPDATE admins SET is_active = 0 WHERE user_id = ?
-    ''', (user_id,))
-    
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        UPDATE admins SET is_active = 0 WHERE user_id = ?
+        ''', (user_id,))
+        affected = cursor.rowcount
     
     return affected > 0
 
@@ -334,9 +1135,11 @@ def get_recent_requests(count=10):
     """Oxirgi so'rovlarni olish"""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(RecentRequestRow)
     
-    cursor.execute('''
-    SELECT r.id, r.status, u.username, u.first_name, r.message, r.created_at,
+    cursor.execute(f'''
+    SELECT r.id, r.status, u.username, u.first_name,
+           substr(r.message, 1, {PREVIEW_LENGTH}), r.created_at,
            (SELECT COUNT(*) FROM replies WHERE request_id = r.id) as reply_count
     FROM requests r
     LEFT JOIN users u ON r.user_id = u.user_id
@@ -345,13 +1148,13 @@ def get_recent_requests(count=10):
     ''', (count,))
     
     results = cursor.fetchall()
-    conn.close()
     return results
 
 def get_request_replies(request_id):
     """So'rovga berilgan javoblarni olish"""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(ReplyRow)
     
     cursor.execute('''
     SELECT r.reply_text, r.created_at, u.username, u.first_name
@@ -362,128 +1165,254 @@ def get_request_replies(request_id):
     ''', (request_id,))
     
     results = cursor.fetchall()
-    conn.close()
     return results
 
-def update_user_activity(user_id):
-    """Foydalanuvchi faolligini yangilash"""
-    conn = get_connection()
-    cursor = conn.cursor()
+def buffer_user_activity(user_id):
+    """Faollik vaqtini xotiradagi buferga yozish (bufer to'lsa True qaytaradi)"""
+    with _activity_lock:
+        _activity_buffer[user_id] = now_timestamp()
+        return len(_activity_buffer) >= config.ACTIVITY_FLUSH_THRESHOLD
+
+def flush_user_activity():
+    """Buferdagi faollik vaqtlarini bitta tranzaksiyada bazaga yozish"""
+    with _activity_lock:
+        if not _activity_buffer:
+            return 0
+        pending = list(_activity_buffer.items())
+        _activity_buffer.clear()
     
-    cursor.execute('''
-    UPDATE users 
-    SET last_active = CURRENT_TIMESTAMP
-    WHERE user_id = ?
-    ''', (user_id,))
+    conn = get_connection()
+    try:
+        with conn:
+            conn.executemany('''
+            UPDATE users 
+            SET last_active = ?
+            WHERE user_id = ?
+            ''', [(last_active, user_id) for user_id, last_active in pending])
+    except Exception as e:
+        # Yozilmaganlarni buferga qaytarish (yangiroq qiymatlarni bosmasdan)
+        with _activity_lock:
+            for user_id, last_active in pending:
+                _activity_buffer.setdefault(user_id, last_active)
+        logger.error(f"❌ Faollikni yozishda xatolik: {e}")
+        return 0
     
-    conn.commit()
-    conn.close()
+    return len(pending)
+
+def update_user_activity(user_id):
+    """Foydalanuvchi faolligini yangilash (buferlanadi, davriy ravishda yoziladi)"""
+    if buffer_user_activity(user_id):
+        flush_user_activity()
 
 def get_user_by_id(user_id):
     """Foydalanuvchini ID bo'yicha olish"""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(UserRow)
     
-    cursor.execute('''
-    SELECT * FROM users WHERE user_id = ?
+    cursor.execute(f'''
+    SELECT {USER_COLUMNS} FROM users u WHERE u.user_id = ?
     ''', (user_id,))
     
     result = cursor.fetchone()
-    conn.close()
     return result
 
-def get_daily_stats():
-    """Kunlik statistika"""
+def save_channel_statuses(rows):
+    """Kanal a'zoligi statuslarini saqlash: [(channel, user_id, status), ...]"""
+    now = now_timestamp()
+    conn = get_connection()
+    with conn:
+        conn.executemany('''
+        INSERT INTO channel_members (channel, user_id, status, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id, channel) DO UPDATE SET
+            status = excluded.status,
+            updated_at = excluded.updated_at
+        ''', [(channel.lower(), user_id, status, now) for channel, user_id, status in rows])
+
+def get_channel_statuses(user_id, max_age):
+    """Foydalanuvchining kanallardagi ma'lum statuslari: {channel: status}
+    
+    max_age soniyadan eski yozuvlar qaytarilmaydi (ular API dan qayta tekshiriladi),
+    max_age=None - yoshidan qat'i nazar barcha yozuvlar.
+    """
     conn = get_connection()
     cursor = conn.cursor()
+    min_updated_at = now_timestamp() - max_age if max_age is not None else 0
     
-    # Bugungi so'rovlar
-    cursor.execute("SELECT COUNT(*) FROM requests WHERE DATE(created_at) = DATE('now')")
-    today_requests = cursor.fetchone()[0]
+    cursor.execute('''
+    SELECT channel, status FROM channel_members
+    WHERE user_id = ? AND updated_at >= ?
+    ''', (user_id, min_updated_at))
     
-    # Bugungi foydalanuvchilar
-    cursor.execute("SELECT COUNT(*) FROM users WHERE DATE(joined_date) = DATE('now')")
-    today_users = cursor.fetchone()[0]
+    return dict(cursor.fetchall())
+
+BROADCAST_JOB_COLUMNS = (
+    "id, text, status, chat_id, progress_message_id, total, sent, failed, skipped, "
+    "created_at, finished_at"
+)
+
+def create_broadcast_job(text, created_by, chat_id):
+    """Broadcast vazifasini yaratish - qabul qiluvchilar bazaning o'zida nusxalanadi
     
-    # Haftalik statistika
-    cursor.execute("""
-    SELECT 
-        DATE(created_at) as day,
-        COUNT(*) as request_count
-    FROM requests 
-    WHERE created_at >= DATE('now', '-7 days')
-    GROUP BY DATE(created_at)
-    ORDER BY day DESC
-    """)
+    Botni bloklagan / akkaunti o'chirilganlar qo'shilmaydi (qayta tekshirish
+    muddati o'tganlaridan tashqari).
+    """
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT INTO broadcast_jobs (text, created_by, chat_id)
+        VALUES (?, ?, ?)
+        ''', (text, created_by, chat_id))
+        job_id = cursor.lastrowid
+        
+        cursor.execute(f'''
+        INSERT INTO broadcast_recipients (job_id, user_id)
+        SELECT ?, user_id FROM users
+        WHERE {DELIVERABLE_CONDITION}
+        ''', (job_id, _reprobe_cutoff()))
+        
+        cursor.execute(
+            "UPDATE broadcast_jobs SET total = ? WHERE id = ?", (cursor.rowcount, job_id)
+        )
     
-    weekly_stats = cursor.fetchall()
+    return job_id
+
+def get_broadcast_job(job_id):
+    """Broadcast vazifasini olish"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory(BroadcastJobRow)
     
-    conn.close()
+    cursor.execute(f"SELECT {BROADCAST_JOB_COLUMNS} FROM broadcast_jobs WHERE id = ?", (job_id,))
+    return cursor.fetchone()
+
+def get_unfinished_broadcast_jobs():
+    """Tugallanmagan (pending/running) broadcast vazifalari - qayta ishga tushirish uchun"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory(BroadcastJobRow)
     
-    return {
-        'today_requests': today_requests,
-        'today_users': today_users,
-        'weekly_stats': weekly_stats
-    }
+    cursor.execute(f'''
+    SELECT {BROADCAST_JOB_COLUMNS} FROM broadcast_jobs
+    WHERE status IN ('pending', 'running')
+    ORDER BY id
+    ''')
+    return cursor.fetchall()
 
-def backup_database():
-    """Ma'lumotlar bazasini backup qilish"""
-    import shutil
-    import os
-    from datetime import datetime
+def get_recent_broadcast_jobs(limit=5):
+    """Oxirgi broadcast vazifalari (yangilari birinchi)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory(BroadcastJobRow)
     
-    backup_dir = "backups"
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
+    cursor.execute(f'''
+    SELECT {BROADCAST_JOB_COLUMNS} FROM broadcast_jobs
+    ORDER BY id DESC
+    LIMIT ?
+    ''', (limit,))
+    return cursor.fetchall()
+
+def set_broadcast_job_status(job_id, status, from_statuses=None):
+    """Broadcast vazifasi holatini o'zgartirish
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = os.path.join(backup_dir, f"tibshifo_support_{timestamp}.db")
+    from_statuses berilsa, holat faqat shu holatlardan birida bo'lsa o'zgaradi.
+    O'zgargan bo'lsa True qaytaradi.
+    """
+    finished = status in ('completed', 'cancelled')
+    query = '''
+    UPDATE broadcast_jobs
+    SET status = ?, finished_at = CASE WHEN ? THEN ? ELSE finished_at END
+    WHERE id = ?
+    '''
+    params = [status, finished, now_timestamp(), job_id]
+    if from_statuses:
+        query += f"AND status IN ({', '.join('?' * len(from_statuses))})"
+        params.extend(from_statuses)
     
-    try:
-        shutil.copy2(config.DATABASE_NAME, backup_file)
-        logger.info(f"✅ Backup yaratildi: {backup_file}")
-        return backup_file
-    except Exception as e:
-        logger.error(f"❌ Backup yaratishda xatolik: {e}")
-        return None
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(query, params)
+    return cursor.rowcount > 0
+
+def set_broadcast_progress_message(job_id, message_id):
+    """Progress xabari ID sini saqlash (qayta ishga tushganda shu xabar yangilanadi)"""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE broadcast_jobs SET progress_message_id = ? WHERE id = ?", (message_id, job_id)
+        )
 
-def cleanup_old_data(days=30):
-    """Eski ma'lumotlarni tozalash"""
+def get_pending_recipients(job_id, limit):
+    """Hali yuborilmagan qabul qiluvchilarning navbatdagi qismi (user_id bo'yicha)"""
     conn = get_connection()
     cursor = conn.cursor()
     
-    try:
-        # 30 kundan oldingi tugatilgan so'rovlarni o'chirish
-        cursor.execute('''
-        DELETE FROM requests 
-        WHERE status = 'completed' 
-        AND created_at < DATE('now', ?)
-        ''', (f'-{days} days',))
-        
-        deleted_requests = cursor.rowcount
-        
-        # Javoblarni ham o'chirish
-        cursor.execute('''
-        DELETE FROM replies 
-        WHERE created_at < DATE('now', ?)
-        ''', (f'-{days} days',))
-        
-        deleted_replies = cursor.rowcount
-        
-        conn.commit()
-        logger.info(f"✅ Eski ma'lumotlar tozalandi: {deleted_requests} so'rov, {deleted_replies} javob")
-        
-        return {
-            'deleted_requests': deleted_requests,
-            'deleted_replies': deleted_replies
-        }
-        
-    except Exception as e:
-        logger.error(f"❌ Ma'lumotlarni tozalashda xatolik: {e}")
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
+    # Natijalar har bir qismdan keyin yoziladi - 'pending' lar o'zi kamayib boradi
+    cursor.execute('''
+    SELECT user_id FROM broadcast_recipients
+    WHERE job_id = ? AND status = 'pending'
+    ORDER BY user_id
+    LIMIT ?
+    ''', (job_id, limit))
+    return [row[0] for row in cursor.fetchall()]
+
+def record_broadcast_results(job_id, results):
+    """Yuborish natijalarini bitta tranzaksiyada yozish: [(user_id, status, error, delivery_state), ...]
+    
+    delivery_state None bo'lmasa foydalanuvchining yetkazish holati ham yangilanadi.
+    """
+    now = now_timestamp()
+    counts = {'sent': 0, 'failed': 0, 'skipped': 0}
+    for _, status, _, _ in results:
+        counts[status] += 1
+    
+    conn = get_connection()
+    with conn:
+        conn.executemany('''
+        UPDATE broadcast_recipients SET status = ?, error = ?, updated_at = ?
+        WHERE job_id = ? AND user_id = ?
+        ''', [(status, error, now, job_id, user_id) for user_id, status, error, _ in results])
+        conn.execute('''
+        UPDATE broadcast_jobs
+        SET sent = sent + ?, failed = failed + ?, skipped = skipped + ?
+        WHERE id = ?
+        ''', (counts['sent'], counts['failed'], counts['skipped'], job_id))
+        _set_delivery_states(conn, [
+            (user_id, state) for user_id, _, _, state in results if state
+        ], now)
+
+def _set_delivery_states(conn, states, now):
+    """Yetkazish holatlarini yozish - 'ok' faqat holat o'zgargan bo'lsa yoziladi"""
+    conn.executemany('''
+    UPDATE users SET delivery_state = ?, delivery_checked_at = ?
+    WHERE user_id = ? AND (? != 'ok' OR delivery_state != 'ok')
+    ''', [(state, now, user_id, state) for user_id, state in states])
+
+def set_delivery_state(user_id, state):
+    """Foydalanuvchiga yetkazish holatini saqlash (ok, blocked, deactivated, not_found)"""
+    conn = get_connection()
+    with conn:
+        _set_delivery_states(conn, [(user_id, state)], now_timestamp())
+
+def get_daily_stats():
+    """Kunlik statistika (config.TIMEZONE bo'yicha mahalliy kunlar)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # Mahalliy kunlar (bugun birinchi) - triggerlar yuritadigan kunlik hisoblagichlardan
+    days = local_days(7)
+    counters = _read_counters(cursor, [('requests', day) for day in days] + [('users', days[0])])
+    weekly_stats = [
+        (day, counters[('requests', day)]) for day in days if counters[('requests', day)] > 0
+    ]
+    
+    return {
+        'today_requests': counters[('requests', days[0])],
+        'today_users': counters[('users', days[0])],
+        'weekly_stats': weekly_stats
+    }
 
 # Test funksiyasi
 def test_database():
@@ -502,7 +1431,6 @@ def test_database():
         for table in tables:
             logger.info(f"  - {table[0]}")
         
-        conn.close()
         logger.info("✅ Database test muvaffaqiyatli!")
         return True
         
@@ -0,0 +1,149 @@
+import logging
+import random
+import re
+import zlib
+from collections import OrderedDict, namedtuple
+import config
+from utils import database
+from utils.time_utils import now_timestamp
+
+logger = logging.getLogger(__name__)
+
+DuplicateMatch = namedtuple("DuplicateMatch", ["request_id", "user_id", "similarity"])
+Signature = namedtuple("Signature", ["shingles", "band_keys"])
+
+# MinHash uchun (a*x + b) mod P permutatsiyalari - doimiy seed, natija jarayonlar orasida bir xil
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(config.DEDUP_BANDS * config.DEDUP_ROWS)
+]
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+def shingles(text):
+    """Matnni normallashtirib, belgi k-gramlari to'plamini qaytarish"""
+    normalized = " ".join(_NON_WORD.sub(" ", text.lower()).split())
+    if not normalized:
+        return set()  # faqat emoji/tinish belgilari - solishtirib bo'lmaydi
+    k = config.DEDUP_SHINGLE_SIZE
+    if len(normalized) <= k:
+        return {normalized}
+    return {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+
+def minhash(shingle_set):
+    """MinHash imzosi (DEDUP_BANDS * DEDUP_ROWS ta qiymat)"""
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+def _band_keys(values):
+    """MinHash imzosini LSH bo'laklariga ajratish"""
+    rows = config.DEDUP_ROWS
+    return [(band, values[band * rows:(band + 1) * rows]) for band in range(config.DEDUP_BANDS)]
+
+def signature(text):
+    """Matn imzosi - bir marta hisoblanib, qidiruv va indeksga qo'shishda ishlatiladi
+
+    Sof Python MinHash uzun matnda o'nlab ms oladi - event loopda emas,
+    asyncio.to_thread orqali chaqiriladi. So'z belgisi bo'lmagan matn uchun
+    bo'sh imzo qaytadi va takroriylik tekshirilmaydi.
+    """
+    shingle_set = shingles(text)
+    if not shingle_set:
+        return Signature(frozenset(), [])
+    return Signature(shingle_set, _band_keys(minhash(shingle_set)))
+
+def jaccard(first, second):
+    """Ikki shingle to'plamining Jaccard o'xshashligi"""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+class RequestIndex:
+    """Oxirgi ochiq so'rovlar bo'yicha MinHash/LSH indeksi
+
+    Imzo DEDUP_BANDS ta bo'lakka bo'linadi; kamida bitta bo'lagi to'liq mos
+    kelgan so'rovlargina nomzod bo'ladi - qidiruv butun indeksni aylanib
+    chiqmaydi. Nomzodlar saqlangan shinglelar bo'yicha aniq tekshiriladi.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()  # request_id -> (user_id, shinglelar, kalitlar, created_at)
+        self._buckets = {}  # (bo'lak, qiymatlar) -> {request_id}
+
+    def add(self, request_id, user_id, sig, created_at=None):
+        """So'rovni indeksga qo'shish (sig - signature() natijasi, bo'sh imzo qo'shilmaydi)"""
+        if not sig.shingles:
+            return
+        self._entries[request_id] = (user_id, sig.shingles, sig.band_keys, created_at or now_timestamp())
+        for key in sig.band_keys:
+            self._buckets.setdefault(key, set()).add(request_id)
+        self._evict()
+
+    def remove(self, request_id):
+        """So'rovni indeksdan o'chirish (yopilgan yoki o'chirilgan)"""
+        entry = self._entries.pop(request_id, None)
+        if not entry:
+            return
+        for key in entry[2]:
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.discard(request_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _evict(self):
+        """Hajm va yosh chegarasidan chiqqan eng eski yozuvlarni o'chirish"""
+        cutoff = now_timestamp() - config.DEDUP_WINDOW
+        while self._entries:
+            request_id, (_, _, _, created_at) = next(iter(self._entries.items()))
+            if len(self._entries) <= config.DEDUP_MAX_ENTRIES and created_at >= cutoff:
+                break
+            self.remove(request_id)
+
+    def find_duplicate(self, user_id, sig):
+        """Eng o'xshash so'rov (DuplicateMatch) yoki None
+
+        O'sha foydalanuvchining so'rovlari uchun DEDUP_USER_THRESHOLD,
+        boshqalarniki uchun qattiqroq DEDUP_GLOBAL_THRESHOLD ishlatiladi.
+        """
+        if not sig.shingles:
+            return None
+        self._evict()
+        candidates = set()
+        for key in sig.band_keys:
+            candidates |= self._buckets.get(key, set())
+
+        best = None
+        for request_id in candidates:
+            owner_id, other_set, _, _ = self._entries[request_id]
+            threshold = config.DEDUP_USER_THRESHOLD if owner_id == user_id else config.DEDUP_GLOBAL_THRESHOLD
+            similarity = jaccard(sig.shingles, other_set)
+            if similarity < threshold:
+                continue
+            # O'z so'rovi boshqalarnikidan ustun, keyin o'xshashlik
+            rank = (owner_id == user_id, similarity)
+            if best is None or rank > (best.user_id == user_id, best.similarity):
+                best = DuplicateMatch(request_id, owner_id, similarity)
+        return best
+
+    def load_recent(self):
+        """Oxirgi ochiq so'rovlarni bazadan yuklash (bot ishga tushganda)"""
+        cutoff = now_timestamp() - config.DEDUP_WINDOW
+        rows = []
+        for status in ('pending', 'in_progress'):
+            # Yangilari birinchi keladi - oynadan eskisiga yetganda to'xtaymiz
+            for row in database.iter_requests_by_status(status):
+                if row.created_at < cutoff:
+                    break
+                rows.append(row)
+
+        # Eskisidan yangisiga - indeks tartibi bo'yicha eng eskilari birinchi chiqariladi
+        rows.sort(key=lambda row: (row.created_at, row.id))
+        for row in rows[-config.DEDUP_MAX_ENTRIES:]:
+            self.add(row.id, row.user_id, signature(row.message), row.created_at)
+        logger.info(f"✅ Takroriy so'rovlar indeksi: {len(self._entries)} ta so'rov yuklandi")
+        return len(self._entries)
+
+request_index = RequestIndex()
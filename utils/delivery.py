@@ -0,0 +1,23 @@
+import logging
+from telegram.error import Forbidden, BadRequest
+from utils import async_db
+
+logger = logging.getLogger(__name__)
+
+def delivery_state_for(error):
+    """Yuborish xatoligidan foydalanuvchi holatini aniqlash (None - foydalanuvchiga bog'liq emas)"""
+    message = str(error).lower()
+    if isinstance(error, Forbidden):
+        # "bot was blocked by the user", "user is deactivated", "bot can't initiate conversation"
+        return 'deactivated' if 'deactivated' in message else 'blocked'
+    if isinstance(error, BadRequest) and 'chat not found' in message:
+        return 'not_found'
+    return None
+
+async def record_delivery_failure(user_id, error):
+    """Foydalanuvchiga yetkazib bo'lmaganini saqlash (keyingi broadcastlar uni o'tkazib yuboradi)"""
+    state = delivery_state_for(error)
+    if state:
+        await async_db.set_delivery_state(user_id, state)
+        logger.info(f"📵 {user_id} ga yetkazib bo'lmaydi: {state}")
+    return state
@@ -0,0 +1,73 @@
+import csv
+import logging
+import os
+import time
+import config
+from utils import database
+from utils.time_utils import format_timestamp
+
+logger = logging.getLogger(__name__)
+
+def _write_csv(path, header, rows):
+    """Qatorlarni CSV faylga birma-bir yozish (hammasi xotiraga yig'ilmaydi)"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+def _export_path(name):
+    """Eksport fayli yo'li (nomida yaratilgan vaqt)"""
+    os.makedirs(config.EXPORT_DIR, exist_ok=True)
+    return os.path.join(config.EXPORT_DIR, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+
+def export_requests(status=None):
+    """So'rovlarni CSV ga eksport qilish: {'path', 'rows'} yoki xatolikda None"""
+    path = _export_path(f"requests_{status or 'all'}")
+    rows = (
+        (
+            row.id, row.user_id, row.username or "", row.first_name or "", row.status,
+            format_timestamp(row.created_at), format_timestamp(row.updated_at), row.message
+        )
+        for row in database.iter_requests_by_status(status)
+    )
+    try:
+        count = _write_csv(
+            path,
+            ["id", "user_id", "username", "first_name", "status", "created_at", "updated_at", "message"],
+            rows
+        )
+    except Exception as e:
+        logger.error(f"❌ So'rovlarni eksport qilishda xatolik: {e}")
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+    logger.info(f"✅ {count} ta so'rov eksport qilindi: {path}")
+    return {'path': path, 'rows': count}
+
+def export_users():
+    """Foydalanuvchilarni CSV ga eksport qilish: {'path', 'rows'} yoki xatolikda None"""
+    path = _export_path("users")
+    rows = (
+        (
+            row.user_id, row.username or "", row.first_name or "", row.last_name or "",
+            format_timestamp(row.joined_date), format_timestamp(row.last_active)
+        )
+        for row in database.iter_users()
+    )
+    try:
+        count = _write_csv(
+            path, ["user_id", "username", "first_name", "last_name", "joined_date", "last_active"], rows
+        )
+    except Exception as e:
+        logger.error(f"❌ Foydalanuvchilarni eksport qilishda xatolik: {e}")
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+    logger.info(f"✅ {count} ta foydalanuvchi eksport qilindi: {path}")
+    return {'path': path, 'rows': count}
@@ -0,0 +1,164 @@
+import logging
+import time
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+import config
+from utils.async_db import get_active_admin_ids
+from utils.outbound import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+class FloodControl:
+    """Foydalanuvchi bo'yicha tezlik chegarasi: so'rov yuborish va menyu uchun alohida budjet
+
+    Budjetdan oshgan foydalanuvchi cooldown oladi; cooldown muddati har bir
+    takroriy buzilishda ikki barobar oshadi (FLOOD_COOLDOWN_MAX gacha).
+    FLOOD_STRIKE_RESET davomida tinch turgan foydalanuvchining hisobi nolga tushadi.
+    """
+
+    def __init__(self):
+        self._buckets = {}  # (user_id, tur) -> TokenBucket
+        self._strikes = {}  # user_id -> (buzilishlar soni, oxirgi buzilish vaqti)
+        self._cooldowns = {}  # user_id -> cooldown tugash vaqti
+        self.metrics = {
+            'allowed': 0,
+            'rejected_submit': 0,
+            'rejected_browse': 0,
+            'dropped_in_cooldown': 0,
+            'cooldowns': 0
+        }
+
+    def _bucket(self, user_id, kind):
+        """Foydalanuvchi budjeti (submit yoki browse)"""
+        key = (user_id, kind)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= config.FLOOD_MAX_TRACKED_USERS:
+                self._forget_idle()
+            if kind == 'submit':
+                bucket = TokenBucket(config.FLOOD_SUBMIT_RATE, config.FLOOD_SUBMIT_BURST)
+            else:
+                bucket = TokenBucket(config.FLOOD_BROWSE_RATE, config.FLOOD_BROWSE_BURST)
+            self._buckets[key] = bucket
+        return bucket
+
+    def _forget_idle(self):
+        """To'la budjetlar va o'tib ketgan cooldownlarni o'chirish"""
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_idle()]:
+            del self._buckets[key]
+        now = time.monotonic()
+        for user_id in [user_id for user_id, until in self._cooldowns.items() if until <= now]:
+            del self._cooldowns[user_id]
+        for user_id in [
+            user_id for user_id, (_, last) in self._strikes.items()
+            if now - last > config.FLOOD_STRIKE_RESET
+        ]:
+            del self._strikes[user_id]
+
+    def check(self, user_id, kind):
+        """(ruxsat, yangi cooldown soniyalari) - cooldown faqat boshlangan paytda qaytariladi"""
+        now = time.monotonic()
+        if self._cooldowns.get(user_id, 0) > now:
+            self.metrics['dropped_in_cooldown'] += 1
+            return False, None
+
+        bucket = self._bucket(user_id, kind)
+        if not bucket.wait_time():
+            bucket.consume()
+            self.metrics['allowed'] += 1
+            return True, None
+
+        self.metrics[f'rejected_{kind}'] += 1
+        strikes, last = self._strikes.get(user_id, (0, now))
+        if now - last > config.FLOOD_STRIKE_RESET:
+            strikes = 0
+        strikes += 1
+        self._strikes[user_id] = (strikes, now)
+
+        cooldown = min(config.FLOOD_COOLDOWN_BASE * 2 ** (strikes - 1), config.FLOOD_COOLDOWN_MAX)
+        self._cooldowns[user_id] = now + cooldown
+        self.metrics['cooldowns'] += 1
+        logger.warning(f"🚫 Flood: {user_id} ({kind}) - {cooldown} s cooldown ({strikes}-marta)")
+        return False, cooldown
+
+    def stats(self):
+        """Metrikalar va hozir cooldowndagi foydalanuvchilar soni
+
+        Flask (/status) threadidan chaqiriladi, lug'atlarni esa event loop o'zgartiradi -
+        ular ustida aylanish o'rniga nusxasi olinadi (list/dict C darajasida, GIL ostida).
+        """
+        now = time.monotonic()
+        metrics = dict(self.metrics)
+        cooldowns = list(self._cooldowns.values())
+        return {
+            **metrics,
+            'active_cooldowns': sum(1 for until in cooldowns if until > now)
+        }
+
+flood_control = FloodControl()
+
+def get_flood_stats():
+    """Flood nazorati statistikasi"""
+    return flood_control.stats()
+
+# Guruh adminlari keshi: (user_id lar, amal qilish muddati) - har bir yangilanishda bazaga murojaat qilinmaydi
+_admin_ids = frozenset()
+_admin_ids_expires = 0.0
+
+def invalidate_admin_cache():
+    """Adminlar ro'yxati o'zgarganda keshni yangilashga majburlash"""
+    global _admin_ids_expires
+    _admin_ids_expires = 0.0
+
+async def _group_admin_ids():
+    """Faol guruh adminlari (FLOOD_ADMIN_CACHE_TTL davomida keshlanadi)"""
+    global _admin_ids, _admin_ids_expires
+    now = time.monotonic()
+    if now >= _admin_ids_expires:
+        # Muddat oldin suriladi - parallel yangilanishlar bazaga bir vaqtda bormaydi
+        _admin_ids_expires = now + config.FLOOD_ADMIN_CACHE_TTL
+        try:
+            _admin_ids = frozenset(await get_active_admin_ids())
+        except Exception as e:
+            logger.error(f"❌ Adminlar ro'yxatini yangilashda xatolik: {e}")
+    return _admin_ids
+
+async def _is_exempt(update):
+    """Asosiy admin, guruh adminlari va support guruhidagi xabarlar cheklanmaydi"""
+    if update.effective_user.id == config.ADMIN_ID:
+        return True
+    if update.effective_chat is not None and update.effective_chat.id == config.GROUP_ID:
+        return True
+    return update.effective_user.id in await _group_admin_ids()
+
+async def flood_guard(update: Update, context):
+    """Barcha handlerlardan oldin: budjetdan oshgan yangilanishni to'xtatish"""
+    if not update.effective_user or not (update.message or update.callback_query):
+        return
+    if await _is_exempt(update):
+        return
+
+    # So'rov matni kutilayotgan bo'lsa - bu yuborish, aks holda menyu/buyruq
+    submitting = update.message is not None and 'waiting_for_request' in context.user_data
+    allowed, cooldown = flood_control.check(update.effective_user.id, 'submit' if submitting else 'browse')
+    if allowed:
+        return
+
+    # Ogohlantirish faqat cooldown boshlanganda - spamga javob ham API budjetini yeydi
+    try:
+        if cooldown:
+            text = f"⏳ Juda ko'p xabar yuborildi. Iltimos, {cooldown} soniyadan keyin urinib ko'ring."
+            if update.callback_query:
+                await update.callback_query.answer(text, show_alert=True)
+            else:
+                await update.message.reply_text(text)
+        elif update.callback_query:
+            await update.callback_query.answer()
+    except Exception as e:
+        logger.debug(f"Flood ogohlantirishini yuborib bo'lmadi: {e}")
+
+    raise ApplicationHandlerStop
+
+def setup_flood_control(application):
+    """Flood nazoratini barcha handlerlardan oldin (group -1) ulash"""
+    application.add_handler(TypeHandler(Update, flood_guard), group=-1)
@@ -4,6 +4,9 @@ import requests
 import logging
 from flask import Flask
 import config
+from utils.channel_check import get_subscription_cache_stats, get_breaker_states
+from utils.flood_control import get_flood_stats
+from utils.update_processor import get_update_stats
 
 logger = logging.getLogger(__name__)
 app = Flask(__name__)
@@ -14,7 +17,14 @@ def home():
 
 @app.route('/health')
 def health():
-    return "OK", 200
+    breakers = get_breaker_states()
+    degraded = any(breaker['state'] != 'closed' for breaker in breakers.values())
+    # Har doim 200 - kanal API muammosi bot jarayonini qayta ishga tushirishni talab qilmaydi
+    return {
+        "status": "degraded" if degraded else "ok",
+        "subscription_policy": config.SUBSCRIPTION_DEGRADED_POLICY,
+        "channel_breakers": breakers
+    }, 200
 
 @app.route('/status')
 def status():
@@ -22,7 +32,10 @@ def status():
         "status": "online",
         "service": "tibshifo-support-bot",
         "port": config.PORT,
-        "timestamp": time.time()
+        "timestamp": time.time(),
+        "subscription_cache": get_subscription_cache_stats(),
+        "flood_control": get_flood_stats(),
+        "update_queue": get_update_stats()
     }
 
 def run_flask():
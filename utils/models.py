@@ -0,0 +1,52 @@
+from collections import namedtuple
+
+# So'rov natijalari uchun qator turlari.
+# namedtuple - __slots__ = () bilan oddiy tuple: har bir qator uchun qo'shimcha
+# dict yaratilmaydi, maydonlarga esa nom bilan murojaat qilinadi.
+
+UserRow = namedtuple("UserRow", [
+    "id", "user_id", "username", "first_name", "last_name", "joined_date", "last_active"
+])
+
+# So'rov tafsilotlari (to'liq xabar matni bilan)
+RequestRow = namedtuple("RequestRow", [
+    "id", "user_id", "message", "status", "admin_id", "created_at", "updated_at",
+    "username", "first_name"
+])
+
+# Ro'yxatlar uchun - message faqat qisqa bo'lagi
+RequestListRow = namedtuple("RequestListRow", [
+    "id", "user_id", "message", "status", "created_at", "username", "first_name"
+])
+
+# Foydalanuvchining o'z so'rovlari - oxirgi admin javobi bilan
+UserRequestRow = namedtuple("UserRequestRow", [
+    "id", "message", "status", "created_at", "last_reply"
+])
+
+RecentRequestRow = namedtuple("RecentRequestRow", [
+    "id", "status", "username", "first_name", "message", "created_at", "reply_count"
+])
+
+ReplyRow = namedtuple("ReplyRow", [
+    "reply_text", "created_at", "username", "first_name"
+])
+
+AdminRow = namedtuple("AdminRow", [
+    "user_id", "username", "first_name", "added_at", "added_by"
+])
+
+# Matn bo'yicha qidiruv natijasi (source: 'request' yoki 'reply')
+RequestMatchRow = namedtuple("RequestMatchRow", [
+    "request_id", "status", "created_at", "source", "snippet"
+])
+
+BroadcastJobRow = namedtuple("BroadcastJobRow", [
+    "id", "text", "status", "chat_id", "progress_message_id", "total", "sent", "failed",
+    "skipped", "created_at", "finished_at"
+])
+
+def row_factory(row_type):
+    """sqlite3 cursor uchun row_factory - qatorni berilgan turga o'giradi"""
+    make = row_type._make
+    return lambda cursor, row: make(row)
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+from collections import deque
+import config
+from utils.time_utils import get_current_time, format_time
+
+logger = logging.getLogger(__name__)
+
+def text_length(text):
+    """Telegram hisoblaydigan uzunlik - UTF-16 birliklari (emoji 2 ta)"""
+    return len(text.encode('utf-16-le')) // 2
+
+def _truncate(text, limit):
+    """Matnni UTF-16 birliklarida limit gacha qisqartirish ("..." bilan)"""
+    if text_length(text) <= limit:
+        return text
+    used = 3
+    for index, char in enumerate(text):
+        used += 2 if ord(char) > 0xFFFF else 1
+        if used > limit:
+            return text[:index] + "..."
+    return text
+
+def _duplicate_note(item):
+    """Boshqa ochiq so'rovga o'xshash bo'lsa - ogohlantirish qatori"""
+    if not item['duplicate_of']:
+        return ""
+    return f"🔁 #{item['duplicate_of']} so'roviga o'xshash (/requestinfo {item['duplicate_of']})\n"
+
+def _addition_mark(item):
+    """Mavjud so'rovga qo'shimcha bo'lsa - belgi"""
+    return " (➕ qo'shimcha)" if item['addition'] else ""
+
+def _notification_text(item, message):
+    """To'liq bildirishnoma matni (message - qisqartirilgan xabar)"""
+    title = "➕ SO'ROVGA QO'SHIMCHA" if item['addition'] else "🆕 YANGI SO'ROV"
+    return (
+        f"{title} #{item['request_id']}\n\n"
+        f"👤 Foydalanuvchi: @{item['username'] or item['first_name']}\n"
+        f"🆔 User ID: {item['user_id']}\n"
+        f"📱 Username: @{item['username'] or 'Yoq'}\n"
+        f"📅 Vaqt: {item['time']}\n\n"
+        f"📝 XABAR:\n{message}\n\n"
+        f"{_duplicate_note(item)}"
+        f"✏️ JAVOB BERISH:\n"
+        f"/reply {item['request_id']} [javob matni]\n\n"
+        f"📄 SO'ROV MA'LUMOTI:\n"
+        f"/requestinfo {item['request_id']}\n\n"
+        f"📋 BARCHA SO'ROVLAR:\n"
+        f"/allrequests"
+    )
+
+def format_request_notification(item):
+    """Bitta yangi so'rov (yoki ochiq so'rovga qo'shimcha) haqida to'liq xabar
+
+    Xabar matni NOTIFY_MAX_TEXT ga sig'adigan qilib qisqartiriladi.
+    """
+    budget = config.NOTIFY_MAX_TEXT - text_length(_notification_text(item, ""))
+    return _notification_text(item, _truncate(item['message'], budget))
+
+def format_request_digest(items, overflow=0):
+    """Bir nechta yangi so'rov uchun bitta umumiy xabar (overflow - navbatga sig'maganlar soni)"""
+    text = f"🆕 YANGI SO'ROVLAR ({len(items) + overflow} ta)\n\n"
+    for item in items:
+        message = item['message']
+        if len(message) > config.NOTIFY_DIGEST_PREVIEW:
+            message = message[:config.NOTIFY_DIGEST_PREVIEW] + "..."
+        text += (
+            f"🔸 #{item['request_id']}{_addition_mark(item)} - @{item['username'] or item['first_name']} "
+            f"(ID: {item['user_id']}), {item['time']}\n"
+            f"📝 {message}\n"
+            f"{_duplicate_note(item)}"
+            f"✏️ /reply {item['request_id']} [javob matni]\n"
+            + "─" * 25 + "\n"
+        )
+    if overflow:
+        text += f"➕ Yana {overflow} ta so'rov - ro'yxatini /allrequests orqali ko'ring\n"
+    text += "\n📄 Batafsil: /requestinfo [ID]\n📋 BARCHA SO'ROVLAR: /allrequests"
+    return text
+
+class GroupNotifier:
+    """Guruhga yangi so'rov bildirishnomalari - yuklama oshsa digestga birlashtiriladi
+
+    Tinch paytda har bir so'rov darhol alohida xabar bo'lib ketadi. Oxirgi
+    daqiqada ko'p xabar yuborilgan bo'lsa yoki navbatda bir nechta so'rov
+    bo'lsa, NOTIFY_DIGEST_WINDOW davomida kelganlari bitta xabarga yig'iladi.
+    So'rov navbatda eng ko'pi bilan shu oyna (va yuborish vaqti) qadar kutadi.
+    Navbat NOTIFY_MAX_PENDING dan oshsa, ortiqchalari faqat keyingi digestda
+    "yana N ta" hisoblagichi sifatida ko'rsatiladi. Digest NOTIFY_MAX_TEXT ga
+    sig'maydigan bo'lsa bo'linadi; yuborilmagan paket navbatga qaytariladi.
+    """
+
+    def __init__(self):
+        self._pending = []
+        self._overflow = 0
+        self._has_pending = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._sent_times = deque()
+        self._worker = None
+
+    def notify(self, bot, request_id, user, message_text, duplicate_of=None, addition=False):
+        """Yangi so'rovni navbatga qo'shish (kutmaydi)
+
+        addition=True - foydalanuvchi o'zining ochiq so'roviga qo'shimcha yozgan.
+        """
+        if len(self._pending) >= config.NOTIFY_MAX_PENDING:
+            if not self._overflow:
+                logger.warning("⚠️ Bildirishnomalar navbati to'la - ortiqchalari digestda soni bilan ko'rsatiladi")
+            self._overflow += 1
+            return
+        self._pending.append({
+            'request_id': request_id,
+            'duplicate_of': duplicate_of,
+            'addition': addition,
+            'attempts': 0,
+            'user_id': user.id,
+            'username': user.username,
+            'first_name': user.first_name,
+            'time': format_time(get_current_time()),
+            'message': message_text
+        })
+        self._has_pending.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run(bot))
+
+    def _take_batch(self):
+        """Navbat boshidan bitta xabarga (NOTIFY_MAX_TEXT) sig'adigan paketni olish"""
+        batch = self._pending[:config.NOTIFY_DIGEST_MAX_ITEMS]
+        overflow = self._overflow
+        while len(batch) > 1 and text_length(format_request_digest(batch, overflow)) > config.NOTIFY_MAX_TEXT:
+            batch.pop()
+        del self._pending[:len(batch)]
+        self._overflow = 0
+        if not self._pending:
+            self._has_pending.clear()
+        return batch, overflow
+
+    def _requeue(self, batch, overflow):
+        """Yuborilmagan paketni navbat boshiga qaytarish (NOTIFY_MAX_ATTEMPTS gacha)"""
+        retry = []
+        for item in batch:
+            item['attempts'] += 1
+            if item['attempts'] < config.NOTIFY_MAX_ATTEMPTS:
+                retry.append(item)
+            else:
+                logger.error(f"❌ #{item['request_id']} bildirishnomasi {item['attempts']} urinishdan keyin tashlandi")
+        self._pending[:0] = retry
+        self._overflow += overflow
+        if self._pending:
+            self._has_pending.set()
+
+    def _under_load(self):
+        """Oxirgi daqiqada guruhga yuborilgan xabarlar chegaradan oshganmi"""
+        now = time.monotonic()
+        while self._sent_times and now - self._sent_times[0] > 60:
+            self._sent_times.popleft()
+        return len(self._sent_times) >= config.NOTIFY_SINGLE_PER_MINUTE
+
+    async def _run(self, bot):
+        """Navbatni yuborish; to'xtatilganda navbat bo'shagach tugaydi"""
+        while True:
+            if not self._pending:
+                if self._stopping.is_set():
+                    return
+                await self._has_pending.wait()
+                continue
+            if (len(self._pending) > 1 or self._under_load()) and not self._stopping.is_set():
+                # Yig'ish oynasi - to'liq digest tayyor bo'lsa yoki bot to'xtayotgan bo'lsa kutilmaydi
+                if len(self._pending) < config.NOTIFY_DIGEST_MAX_ITEMS:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), config.NOTIFY_DIGEST_WINDOW)
+                    except asyncio.TimeoutError:
+                        pass
+
+            batch, overflow = self._take_batch()
+            if await self._send(bot, batch, overflow):
+                continue
+            self._requeue(batch, overflow)
+            if not self._stopping.is_set():
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), config.NOTIFY_RETRY_DELAY)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _send(self, bot, batch, overflow=0):
+        """Bitta so'rov - to'liq xabar, bir nechta - digest. Yuborilgan bo'lsa True"""
+        if len(batch) == 1 and not overflow:
+            text = format_request_notification(batch[0])
+        else:
+            text = format_request_digest(batch, overflow)
+        ids = ", ".join(f"#{item['request_id']}" for item in batch)
+        try:
+            await bot.send_message(chat_id=config.GROUP_ID, text=text, disable_web_page_preview=True)
+            self._sent_times.append(time.monotonic())
+            logger.info(f"✅ Guruhga yuborildi: {ids}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Guruhga xabar yuborishda xatolik ({ids}): {e}")
+            return False
+
+    async def stop(self, bot):
+        """Bot to'xtaganda navbatda qolganlarini yuborib, worker tugashini kutish
+
+        Worker bekor qilinmaydi - yuborilayotgan paket yo'qolmaydi.
+        """
+        self._stopping.set()
+        self._has_pending.set()
+        if self._pending and (self._worker is None or self._worker.done()):
+            self._worker = asyncio.create_task(self._run(bot))
+        if self._worker:
+            await self._worker
+            self._worker = None
+        self._has_pending.clear()
+
+group_notifier = GroupNotifier()
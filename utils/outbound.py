@@ -0,0 +1,184 @@
+import asyncio
+import itertools
+import logging
+import time
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+import config
+
+logger = logging.getLogger(__name__)
+
+# Navbat yo'laklari - kichik raqam birinchi yuboriladi
+LANE_USER = 0       # foydalanuvchilarga javoblar (shaxsiy chatlar)
+LANE_GROUP = 1      # guruh/kanal xabarlari (yangi so'rov bildirishnomalari)
+LANE_BROADCAST = 2  # ommaviy yuborish
+
+# Limitlanadigan metodlar: chatga yangi xabar chiqaradigan yoki uni o'zgartiradiganlar
+LIMITED_PREFIXES = ("send", "copy", "forward", "edit")
+
+class TokenBucket:
+    """Token bucket - o'rtacha tezlik rate/s, qisqa portlash capacity tagacha"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Telegram RetryAfter qaytarsa - barcha yuborishlarni to'xtatib turish"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def _refill(self, now):
+        """O'tgan vaqt uchun tokenlarni to'ldirish"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Keyingi token uchun kutish vaqti, soniya (0 - hozir bor)"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        """Tokenni kutmasdan olish (wait_time() == 0 tekshirilgandan keyin)"""
+        self.tokens -= 1
+
+    def is_idle(self):
+        """Bucket to'la va pauzada emas - uni o'chirsa bo'ladi"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return False
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+    async def acquire(self):
+        """Bitta token olish (kerak bo'lsa kutadi)"""
+        async with self._lock:
+            while True:
+                delay = self.wait_time()
+                if not delay:
+                    self.consume()
+                    return
+                await asyncio.sleep(delay)
+
+class OutboundScheduler(BaseRateLimiter):
+    """Barcha chiquvchi xabarlar uchun yagona navbat (Application rate_limiter sifatida)
+
+    Har bir yuborish umumiy limit va chat limiti (shaxsiy yoki guruh) tokenini
+    kutadi. Bir nechta so'rov tayyor bo'lsa yo'lak ustuvorligi bo'yicha tanlanadi -
+    foydalanuvchiga javob broadcast ortida navbat kutmaydi. Band chat navbatni
+    to'sib qo'ymaydi: keyingi tayyor chat xabari o'tkaziladi.
+    RetryAfter da chat (shaxsiy chatlarda umumiy limit ham) to'xtatilib qayta uriniladi.
+    """
+
+    def __init__(self):
+        self._global = TokenBucket(config.OUTBOUND_GLOBAL_RATE, config.OUTBOUND_GLOBAL_BURST)
+        self._chats = {}
+        self._waiting = []  # [(lane, seq, chat_id, future)]
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+
+    async def initialize(self):
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for _, _, _, future in self._waiting:
+            future.cancel()
+        self._waiting.clear()
+
+    @staticmethod
+    def _is_group(chat_id):
+        """Guruh yoki kanal chatimi"""
+        # Guruh va kanal ID lari manfiy, kanal username lari satr
+        return isinstance(chat_id, str) or chat_id < 0
+
+    def _chat_bucket(self, chat_id):
+        """Chat limiti (shaxsiy: ~1/s, guruh: ~20/min)"""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= config.OUTBOUND_MAX_TRACKED_CHATS:
+                # Bo'sh turgan chatlar limiti boshlang'ich holatda - ularni unutsa bo'ladi
+                for idle in [key for key, value in self._chats.items() if value.is_idle()]:
+                    del self._chats[idle]
+            if self._is_group(chat_id):
+                bucket = TokenBucket(config.OUTBOUND_GROUP_RATE, config.OUTBOUND_GROUP_BURST)
+            else:
+                bucket = TokenBucket(config.OUTBOUND_CHAT_RATE, config.OUTBOUND_CHAT_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _next_ready(self):
+        """Eng ustuvor tayyor so'rov (indeks) yoki None va eng yaqin kutish vaqti"""
+        self._waiting = [entry for entry in self._waiting if not entry[3].done()]
+        best = None
+        soonest = None
+        for index, (lane, seq, chat_id, _) in enumerate(self._waiting):
+            delay = self._chat_bucket(chat_id).wait_time()
+            if delay:
+                soonest = delay if soonest is None else min(soonest, delay)
+            elif best is None or (lane, seq) < self._waiting[best][:2]:
+                best = index
+        return best, soonest
+
+    async def _dispatch(self):
+        """Navbatdan so'rovlarni limitlar va ustuvorlik bo'yicha chiqarish"""
+        while True:
+            best, soonest = self._next_ready()
+            if best is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), soonest)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            delay = self._global.wait_time()
+            if delay:
+                # Kutish paytida ustuvorroq so'rov kelishi mumkin - keyin qayta tanlanadi
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, chat_id, future = self._waiting.pop(best)
+            self._global.consume()
+            self._chat_bucket(chat_id).consume()
+            future.set_result(None)
+
+    async def _wait_turn(self, chat_id, lane):
+        """Dispatcher ruxsat berguncha kutish"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append((lane, next(self._seq), chat_id, future))
+        self._wakeup.set()
+        await future
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if chat_id is None or not endpoint.startswith(LIMITED_PREFIXES):
+            return await callback(*args, **kwargs)
+
+        lane = (rate_limit_args or {}).get(
+            "lane", LANE_GROUP if self._is_group(chat_id) else LANE_USER
+        )
+        attempt = 0
+        while True:
+            await self._wait_turn(chat_id, lane)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                attempt += 1
+                if attempt > config.OUTBOUND_MAX_RETRIES:
+                    raise
+                logger.warning(f"⚠️ {endpoint} ({chat_id}): RetryAfter {e.retry_after} s")
+                self._chat_bucket(chat_id).pause(e.retry_after)
+                if not self._is_group(chat_id):
+                    # Shaxsiy chatda bunday javob odatda umumiy limitdan
+                    self._global.pause(e.retry_after)
@@ -0,0 +1,193 @@
+import gzip
+import json
+import logging
+import os
+import time
+import config
+from utils.database import get_connection, invalidate_status_counts
+from utils.time_utils import now_timestamp, format_timestamp
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = "requests_"
+
+def _archive_path(created_at):
+    """So'rov yaratilgan oy bo'yicha arxiv fayli yo'li"""
+    month = format_timestamp(created_at or now_timestamp(), "%Y-%m")
+    return os.path.join(config.ARCHIVE_DIR, f"{ARCHIVE_PREFIX}{month}.jsonl.gz")
+
+def _select_expired_batch(conn, days, batch_size):
+    """Muddati o'tgan yakunlangan so'rovlarning navbatdagi qismini olish"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT id, user_id, message, status, admin_id, created_at, updated_at
+    FROM requests
+    WHERE status = 'completed'
+    AND created_at < ?
+    ORDER BY created_at, id
+    LIMIT ?
+    ''', (now_timestamp() - days * 86400, batch_size))
+    requests = cursor.fetchall()
+
+    if not requests:
+        return [], {}
+
+    ids = [row[0] for row in requests]
+    cursor.execute(f'''
+    SELECT request_id, id, admin_id, reply_text, created_at
+    FROM replies
+    WHERE request_id IN ({", ".join("?" * len(ids))})
+    ORDER BY request_id, created_at
+    ''', ids)
+
+    replies = {}
+    for request_id, reply_id, admin_id, reply_text, created_at in cursor.fetchall():
+        replies.setdefault(request_id, []).append({
+            'id': reply_id,
+            'admin_id': admin_id,
+            'reply_text': reply_text,
+            'created_at': created_at
+        })
+
+    return requests, replies
+
+def _write_archive(requests, replies):
+    """So'rovlarni oylik gzip JSONL fayllarga qo'shish; {request_id: fayl} qaytaradi"""
+    os.makedirs(config.ARCHIVE_DIR, exist_ok=True)
+    archived_at = now_timestamp()
+
+    by_file = {}
+    for row in requests:
+        by_file.setdefault(_archive_path(row[5]), []).append(row)
+
+    locations = {}
+    for path, rows in by_file.items():
+        # Har bir yozish yangi gzip a'zosi - fayl faqat oxiriga to'ldiriladi
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+                for request_id, user_id, message, status, admin_id, created_at, updated_at in rows:
+                    record = {
+                        'request': {
+                            'id': request_id,
+                            'user_id': user_id,
+                            'message': message,
+                            'status': status,
+                            'admin_id': admin_id,
+                            'created_at': created_at,
+                            'updated_at': updated_at
+                        },
+                        'replies': replies.get(request_id, []),
+                        'archived_at': archived_at
+                    }
+                    archive.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+                    locations[request_id] = os.path.basename(path)
+            # O'chirishdan oldin arxiv diskka yozilgan bo'lishi shart
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    return locations
+
+def _delete_archived(conn, locations):
+    """Arxivlangan so'rovlar va ularning javoblarini bitta qisqa tranzaksiyada o'chirish"""
+    ids = list(locations)
+    placeholders = ", ".join("?" * len(ids))
+
+    with conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+        INSERT OR REPLACE INTO archived_requests (request_id, archive_file)
+        VALUES (?, ?)
+        ''', locations.items())
+        # Faqat arxivlangan so'rovlarning javoblari o'chiriladi
+        cursor.execute(f"DELETE FROM replies WHERE request_id IN ({placeholders})", ids)
+        deleted_replies = cursor.rowcount
+        cursor.execute(f"DELETE FROM requests WHERE id IN ({placeholders})", ids)
+        deleted_requests = cursor.rowcount
+
+    return deleted_requests, deleted_replies
+
+def _incremental_vacuum(conn):
+    """Bo'shagan sahifalarni kichik qismlarda faylga qaytarish"""
+    freed = 0
+    while conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.executescript(f"PRAGMA incremental_vacuum({config.RETENTION_VACUUM_PAGES});")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if after >= before:
+            break  # auto_vacuum yoqilmagan
+        freed += before - after
+        time.sleep(config.RETENTION_BATCH_PAUSE)
+    return freed
+
+def cleanup_old_data(days=None, batch_size=None):
+    """Eski ma'lumotlarni arxivlab tozalash
+
+    Yakunlangan eski so'rovlar kichik qismlarda avval arxivga yoziladi,
+    keyin bazadan o'chiriladi - yozish qulfi uzoq ushlanmaydi.
+    """
+    days = days if days is not None else config.RETENTION_DAYS
+    batch_size = batch_size or config.RETENTION_BATCH_SIZE
+    conn = get_connection()
+
+    deleted_requests = 0
+    deleted_replies = 0
+    try:
+        while True:
+            requests, replies = _select_expired_batch(conn, days, batch_size)
+            if not requests:
+                break
+
+            locations = _write_archive(requests, replies)
+            batch_requests, batch_replies = _delete_archived(conn, locations)
+            deleted_requests += batch_requests
+            deleted_replies += batch_replies
+
+            # Qismlar orasida jonli so'rovlarga yo'l berish
+            time.sleep(config.RETENTION_BATCH_PAUSE)
+
+        freed_pages = _incremental_vacuum(conn)
+    except Exception as e:
+        logger.error(f"❌ Ma'lumotlarni tozalashda xatolik: {e}")
+        if conn.in_transaction:
+            conn.rollback()
+        return None
+    finally:
+        if deleted_requests:
+            invalidate_status_counts()
+
+    logger.info(
+        f"✅ Eski ma'lumotlar arxivlandi va tozalandi: {deleted_requests} so'rov, "
+        f"{deleted_replies} javob, {freed_pages} sahifa bo'shatildi"
+    )
+
+    return {
+        'deleted_requests': deleted_requests,
+        'deleted_replies': deleted_replies,
+        'freed_pages': freed_pages
+    }
+
+def find_archived_request(request_id):
+    """Arxivdan so'rovni ID bo'yicha topish ({'request', 'replies', 'archived_at'} yoki None)"""
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT archive_file FROM archived_requests WHERE request_id = ?", (request_id,)
+    ).fetchone()
+
+    if not row:
+        return None
+
+    path = os.path.join(config.ARCHIVE_DIR, row[0])
+    if not os.path.exists(path):
+        logger.error(f"❌ Arxiv fayli topilmadi: {path}")
+        return None
+
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                record = json.loads(line)
+                if record['request']['id'] == request_id:
+                    return record
+    except (OSError, EOFError, ValueError) as e:
+        logger.error(f"❌ Arxiv faylini o'qishda xatolik {path}: {e}")
+
+    return None
@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timedelta
 import pytz
 import logging
@@ -14,6 +15,30 @@ def format_time(date_time, format_str="%Y-%m-%d %H:%M:%S"):
     """Vaqtni formatlash"""
     return date_time.strftime(format_str)
 
+def now_timestamp():
+    """Joriy vaqt - epoch soniyalarda (bazada shu ko'rinishda saqlanadi)"""
+    return int(time.time())
+
+def format_timestamp(timestamp, format_str="%Y-%m-%d %H:%M:%S", timezone=config.TIMEZONE):
+    """Epoch vaqtni mahalliy vaqt zonasida formatlash"""
+    if timestamp is None:
+        return "-"
+    if isinstance(timestamp, str):
+        return timestamp  # migratsiyadan oldingi arxiv yozuvlari matn ko'rinishida
+    return datetime.fromtimestamp(timestamp, pytz.timezone(timezone)).strftime(format_str)
+
+def local_days(days=1, timezone=config.TIMEZONE):
+    """Oxirgi kunlarning mahalliy sanalari, bugundan boshlab: ['YYYY-MM-DD', ...]
+
+    Kunlik statistika hisoblagichlarining kalitlari shu ko'rinishda.
+    """
+    today = datetime.now(pytz.timezone(timezone)).date()
+    return [(today - timedelta(days=offset)).isoformat() for offset in range(days)]
+
+def utc_offset_seconds(timezone=config.TIMEZONE):
+    """Mintaqaning hozirgi UTC siljishi, soniyada"""
+    return int(datetime.now(pytz.timezone(timezone)).utcoffset().total_seconds())
+
 def is_working_hours(start_hour=9, end_hour=18):
     """Ish vaqtida ekanligini tekshirish"""
     current_time = get_current_time()
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import sys
+from telegram.ext import BaseUpdateProcessor
+import config
+
+logger = logging.getLogger(__name__)
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Turli foydalanuvchilarning yangilanishlari parallel, bitta foydalanuvchiniki - kelgan tartibda
+
+    BaseUpdateProcessor semafori process_update da foydalanuvchi tekshiruvidan
+    oldin olinadi, shuning uchun u cheklovsiz qilingan. Tartib quyidagicha:
+    1. Foydalanuvchi navbati max_per_user dan oshsa - yangilanish darhol tashlanadi
+       (hech qanday o'rin band qilinmaydi, bitta foydalanuvchi boshqalarni to'sa olmaydi).
+    2. max_pending - qabul qilingan, hali tugamagan yangilanishlar chegarasi.
+    3. Foydalanuvchi qulfi - uning xabarlari kelgan tartibda bajariladi.
+    4. workers - bir vaqtda ishlayotgan handlerlar; qulfdan keyin olinadi.
+    """
+
+    def __init__(self, workers, max_pending, max_per_user):
+        super().__init__(sys.maxsize)
+        self._workers = asyncio.Semaphore(workers)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._max_per_user = max_per_user
+        # Kalit -> [qulf, navbatdagilar soni, shu navbat davomida tashlanganlar]; bo'sh qolganlari o'chiriladi
+        self._user_locks = {}
+        self.dropped = 0
+
+    @staticmethod
+    def _serialization_key(update):
+        """Tartib saqlanadigan kalit: foydalanuvchi, bo'lmasa chat (None - cheklovsiz)"""
+        if getattr(update, 'effective_user', None):
+            return update.effective_user.id
+        if getattr(update, 'effective_chat', None):
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self._serialization_key(update)
+        if key is None:
+            async with self._pending:
+                async with self._workers:
+                    await coroutine
+            return
+
+        entry = self._user_locks.get(key)
+        if entry is None:
+            entry = self._user_locks[key] = [asyncio.Lock(), 0, 0]
+        elif entry[1] >= self._max_per_user:
+            # Navbat to'la - await qilmasdan tashlanadi
+            coroutine.close()
+            self.dropped += 1
+            entry[2] += 1
+            if entry[2] == 1:
+                # Har bir tashlanganini emas - birinchisini, jamini navbat bo'shaganda yozamiz
+                logger.warning(f"⚠️ Yangilanishlar tashlanmoqda: {key} navbati to'la ({entry[1]})")
+            return
+
+        entry[1] += 1
+        try:
+            async with self._pending:
+                async with entry[0]:
+                    async with self._workers:
+                        await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._user_locks[key]
+                if entry[2]:
+                    logger.warning(f"⚠️ {key}: navbat to'la bo'lgani uchun {entry[2]} ta yangilanish tashlandi")
+
+    def stats(self):
+        """Tashlangan yangilanishlar va navbati bor foydalanuvchilar soni (/status uchun)"""
+        return {
+            'dropped': self.dropped,
+            'queued_users': len(self._user_locks)
+        }
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+update_processor = PerUserUpdateProcessor(
+    config.UPDATE_WORKERS, config.UPDATE_MAX_PENDING, config.UPDATE_MAX_PER_USER
+)
+
+def get_update_stats():
+    """Yangilanishlar navbati statistikasi"""
+    return update_processor.stats()